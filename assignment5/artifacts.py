@@ -0,0 +1,171 @@
+"""On-disk cache for the expensive stage outputs of assignment5.py.
+
+An entry is one .npz file named by the hash of everything that determines the
+result: the contents of the model file and the parameters of this stage and of
+every stage before it. Meshes and point clouds are stored as their numpy
+arrays, so entries load back exactly. Several processes may share the
+directory (batch.py): entries are written to a temporary file and renamed.
+When the directory grows past max_mb the least recently used entries are
+deleted.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import open3d as o3d
+
+_digests = {}  # (path, size, mtime) -> sha256 of the file
+
+
+def file_digest(path):
+    """sha256 of the file contents, remembered while the file is unchanged"""
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo not in _digests:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _digests[memo] = h.hexdigest()
+    return _digests[memo]
+
+
+def stage_key(stage, parent, **params):
+    """Key of a stage output: stage name, key of its input and its parameters"""
+    text = json.dumps({"stage": stage, "parent": parent, "params": params}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def mesh_arrays(mesh):
+    arrays = {"vertices": np.asarray(mesh.vertices), "triangles": np.asarray(mesh.triangles)}
+    if mesh.has_vertex_normals():
+        arrays["vertex_normals"] = np.asarray(mesh.vertex_normals)
+    if mesh.has_vertex_colors():
+        arrays["vertex_colors"] = np.asarray(mesh.vertex_colors)
+    return arrays
+
+
+def mesh_from_arrays(arrays):
+    mesh = o3d.geometry.TriangleMesh(o3d.utility.Vector3dVector(arrays["vertices"]),
+                                     o3d.utility.Vector3iVector(arrays["triangles"]))
+    if "vertex_normals" in arrays:
+        mesh.vertex_normals = o3d.utility.Vector3dVector(arrays["vertex_normals"])
+    if "vertex_colors" in arrays:
+        mesh.vertex_colors = o3d.utility.Vector3dVector(arrays["vertex_colors"])
+    return mesh
+
+
+def pointcloud_arrays(pcd):
+    arrays = {"points": np.asarray(pcd.points)}
+    if pcd.has_normals():
+        arrays["normals"] = np.asarray(pcd.normals)
+    if pcd.has_colors():
+        arrays["colors"] = np.asarray(pcd.colors)
+    return arrays
+
+
+def pointcloud_from_arrays(arrays):
+    pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(arrays["points"]))
+    if "normals" in arrays:
+        pcd.normals = o3d.utility.Vector3dVector(arrays["normals"])
+    if "colors" in arrays:
+        pcd.colors = o3d.utility.Vector3dVector(arrays["colors"])
+    return pcd
+
+
+class ArtifactCache:
+    def __init__(self, directory, max_mb=2048):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def load(self, key):
+        """Arrays stored under key, or None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (zipfile.BadZipFile, EOFError, ValueError, OSError):
+            # truncated or damaged entry: a miss, and the next store() rewrites it
+            self.misses += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)  # mtime = last use, for eviction
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return arrays
+
+    def store(self, key, arrays):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp)  # evict() only counts .npz files, so a leftover would never go away
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the directory fits in max_bytes"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz"):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def mesh(self, key, build):
+        """Cached mesh for key; build() makes it on a miss"""
+        arrays = self.load(key)
+        if arrays is not None:
+            return mesh_from_arrays(arrays)
+        mesh = build()
+        self.store(key, mesh_arrays(mesh))
+        return mesh
+
+    def pointcloud(self, key, build):
+        arrays = self.load(key)
+        if arrays is not None:
+            return pointcloud_from_arrays(arrays)
+        pcd = build()
+        self.store(key, pointcloud_arrays(pcd))
+        return pcd
+
+    def arrays(self, key, build):
+        """Cached dict of numpy arrays for key; build() makes it on a miss"""
+        arrays = self.load(key)
+        if arrays is not None:
+            return arrays
+        arrays = build()
+        self.store(key, arrays)
+        return arrays
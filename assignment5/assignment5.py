@@ -1,6 +1,10 @@
 import open3d as o3d
 import numpy as np
-import copy
+import artifacts
+import clipping
+import ply_stream
+from spatial import SpatialIndex
+from voxels import VoxelPyramid
 
 # ========================================
 # CONFIGURATION: Set model path here
@@ -8,6 +12,147 @@ import copy
 MODEL_PATH = "models/model.ply"
 # recommended to use .ply format
 
+# Open a window after each step and wait for Enter at start.
+# batch.py turns this off to run on headless machines.
+VISUALIZE = True
+
+# Poisson reconstructions, normals and sampled point clouds are cached here,
+# keyed by the model file contents and the stage parameters (see artifacts.py).
+# Set CACHE_DIR = None to always recompute.
+CACHE_DIR = ".artifacts"
+CACHE_MAX_MB = 2048
+
+# Binary PLY point clouds larger than STREAM_THRESHOLD_MB are never loaded whole:
+# ply_stream.py reads them chunk by chunk into at most STREAM_MAX_POINTS points
+# ("voxel" or "reservoir" downsampling) within about STREAM_MEMORY_MB of memory,
+# and steps 2-7 run on that cloud instead of a resampled mesh.
+STREAM_THRESHOLD_MB = 512
+STREAM_MAX_POINTS = 1_000_000
+STREAM_MEMORY_MB = 1024
+STREAM_METHOD = "voxel"
+
+# Step 4 builds a voxel pyramid once: level 0 has voxels VOXEL_FINER_LEVELS times
+# halved from 1/100 of the largest dimension, every next level doubles the voxel
+# size, up to VOXEL_LEVELS levels. Step 4 shows the 1/100 level; other levels and
+# boxes come from voxel_pyramid(pcd) without rescanning the points.
+VOXEL_FINER_LEVELS = 2
+VOXEL_LEVELS = 10
+
+_cache = None
+_lineage = {}  # id(geometry) -> (geometry, cache key it was built from)
+_indexes = {}  # id(point cloud) -> (point cloud, its SpatialIndex)
+_scans = {}  # id(mesh) -> (mesh, streamed point cloud, stream statistics)
+_pyramids = {}  # id(point cloud) -> (point cloud, its VoxelPyramid)
+
+
+def get_cache():
+    """Artifact cache for CACHE_DIR, or None if caching is off"""
+    global _cache
+    if CACHE_DIR is None:
+        return None
+    if _cache is None or _cache.directory != CACHE_DIR:
+        _cache = artifacts.ArtifactCache(CACHE_DIR, CACHE_MAX_MB)
+    return _cache
+
+
+def remember(geometry, key):
+    if key is not None:
+        _lineage[id(geometry)] = (geometry, key)
+    return geometry
+
+
+def key_of(geometry):
+    """Cache key of a geometry made by an earlier step, or None"""
+    entry = _lineage.get(id(geometry))
+    return entry[1] if entry and entry[0] is geometry else None
+
+
+def scan_info(mesh):
+    """Full-resolution statistics of the streamed scan behind mesh, or None"""
+    entry = _scans.get(id(mesh))
+    if not entry or entry[0] is not mesh:
+        return None
+    _, pcd, scan = entry
+    info = {
+        "points_in_file": int(scan["count"]),
+        "points_kept": len(pcd.points),
+        "bounds": scan["bounds"].tolist(),
+        "extremes": {name: scan["extremes"][axis].tolist() for axis, name in enumerate("xyz")},
+    }
+    if "voxel_size" in scan:
+        info["voxel_size"] = float(scan["voxel_size"])
+    return info
+
+
+def spatial_index(pcd):
+    """SpatialIndex of pcd, built on the first request and shared by all steps"""
+    entry = _indexes.get(id(pcd))
+    if entry and entry[0] is pcd:
+        return entry[1]
+    return attach_index(pcd, SpatialIndex(np.asarray(pcd.points)))
+
+
+def voxel_pyramid(pcd, voxel_size=None):
+    """VoxelPyramid of pcd whose level VOXEL_FINER_LEVELS has voxel_size voxels.
+
+    Built on the first request (step 4); voxel_size=None returns the existing one.
+    """
+    entry = _pyramids.get(id(pcd))
+    if entry and entry[0] is pcd and (voxel_size is None or entry[2] == voxel_size):
+        return entry[1]
+    if voxel_size is None:
+        return None
+    # same half-voxel margin as create_from_point_cloud, so the step 4 level matches it
+    index = spatial_index(pcd)
+    low = index.bounds[0] if len(index) else np.zeros(3)  # an empty cloud has no bounds
+    pyramid = VoxelPyramid(index.points, voxel_size / (1 << VOXEL_FINER_LEVELS),
+                           low - voxel_size / 2, VOXEL_LEVELS,
+                           np.asarray(pcd.colors) if pcd.has_colors() else None)
+    _pyramids[id(pcd)] = (pcd, pyramid, voxel_size)
+    return pyramid
+
+
+def attach_index(pcd, index):
+    _indexes[id(pcd)] = (pcd, index)
+    return index
+
+
+def cached(kind, parent_key, stage, build, **params):
+    """(result, key): build() through the cache ("mesh", "pointcloud" or "arrays")"""
+    cache = get_cache()
+    if cache is None or parent_key is None:
+        return build(), None
+    key = artifacts.stage_key(stage, parent_key, **params)
+    return getattr(cache, kind)(key, build), key
+
+
+def show(geometries, window_name, closing="continue"):
+    """Open a visualization window (only if VISUALIZE is on)"""
+    if not VISUALIZE:
+        return
+    print("\n>>> Opening visualization window...")
+    print(f">>> Close window to {closing}")
+    o3d.visualization.draw_geometries(geometries,
+                                      window_name=window_name,
+                                      width=1024, height=768)
+
+
+def print_pyramid_info(pyramid, step_name="Voxel Pyramid"):
+    """Print voxel size, voxel count and memory of every pyramid level"""
+    print(f"\n{step_name}:")
+    for level in pyramid.info():
+        print(f"  Level {level['level']}: voxel size {level['voxel_size']:.6f}, "
+              f"{level['voxels']} voxels, {level['bytes'] / 1024:.1f} KB")
+
+
+def print_index_info(index, step_name="Spatial Index"):
+    """Print how long the index took to build and to answer each kind of query"""
+    print(f"\n{step_name}:")
+    print(f"  Number of points: {len(index)}")
+    for name, (calls, seconds) in index.info()["timings"].items():
+        print(f"  {name}: {calls} call(s), {seconds * 1000:.1f} ms")
+
+
 def print_separator(step_number, step_name):
     """Print separator between steps"""
     print("\n" + "="*80)
@@ -15,65 +160,145 @@ def print_separator(step_number, step_name):
     print("="*80)
 
 
+def mesh_info(mesh):
+    """Mesh statistics as a dict"""
+    extent = mesh.get_axis_aligned_bounding_box().get_extent()
+    return {
+        "vertices": len(mesh.vertices),
+        "triangles": len(mesh.triangles),
+        "bbox_extent": [float(v) for v in extent],
+        "has_vertex_colors": mesh.has_vertex_colors(),
+        "has_vertex_normals": mesh.has_vertex_normals(),
+    }
+
+
+def pointcloud_info(pcd):
+    """Point cloud statistics as a dict"""
+    return {
+        "points": len(pcd.points),
+        "has_colors": pcd.has_colors(),
+        "has_normals": pcd.has_normals(),
+    }
+
+
+def voxel_info(voxel_grid):
+    """Voxel grid statistics as a dict"""
+    return {
+        "voxels": len(voxel_grid.get_voxels()),
+        "voxel_size": float(voxel_grid.voxel_size),
+    }
+
+
 def print_mesh_info(mesh, step_name="Mesh"):
     """Print mesh information"""
-    bbox = mesh.get_axis_aligned_bounding_box()
-    extent = bbox.get_extent()
+    info = mesh_info(mesh)
+    extent = info["bbox_extent"]
     print(f"\n{step_name}:")
-    print(f"  Number of vertices: {len(mesh.vertices)}")
-    print(f"  Number of triangles: {len(mesh.triangles)}")
+    print(f"  Number of vertices: {info['vertices']}")
+    print(f"  Number of triangles: {info['triangles']}")
     print(f"  Bounding box size: X={extent[0]:.4f}, Y={extent[1]:.4f}, Z={extent[2]:.4f}")
-    print(f"  Has vertex colors: {'Yes' if mesh.has_vertex_colors() else 'No'}")
-    print(f"  Has vertex normals: {'Yes' if mesh.has_vertex_normals() else 'No'}")
+    print(f"  Has vertex colors: {'Yes' if info['has_vertex_colors'] else 'No'}")
+    print(f"  Has vertex normals: {'Yes' if info['has_vertex_normals'] else 'No'}")
 
 
 def print_pointcloud_info(pcd, step_name="Point Cloud"):
     """Print point cloud information"""
+    info = pointcloud_info(pcd)
     print(f"\n{step_name}:")
-    print(f"  Number of points: {len(pcd.points)}")
-    print(f"  Has colors: {'Yes' if pcd.has_colors() else 'No'}")
-    print(f"  Has normals: {'Yes' if pcd.has_normals() else 'No'}")
+    print(f"  Number of points: {info['points']}")
+    print(f"  Has colors: {'Yes' if info['has_colors'] else 'No'}")
+    print(f"  Has normals: {'Yes' if info['has_normals'] else 'No'}")
 
 
 def print_voxel_info(voxel_grid, step_name="Voxel Grid"):
     """Print voxel grid information"""
+    info = voxel_info(voxel_grid)
     print(f"\n{step_name}:")
-    voxels = voxel_grid.get_voxels()
-    print(f"  Number of voxels: {len(voxels)}")
-    print(f"  Voxel size: {voxel_grid.voxel_size}")
+    print(f"  Number of voxels: {info['voxels']}")
+    print(f"  Voxel size: {info['voxel_size']}")
 
 
 # ========================================
 # STEP 1: Loading and Visualization
 # ========================================
-def step1_load_and_visualize():
-    print_separator(1, "Loading and Visualization")
-    
-    mesh = o3d.io.read_triangle_mesh(MODEL_PATH)
+def load_model(model_path, source):
+    """(mesh, key) for a model that fits in memory"""
+    mesh = o3d.io.read_triangle_mesh(model_path)
     
     if len(mesh.triangles) == 0:
         print("\nNote: Model has no triangles. Loading as point cloud...")
-        pcd_direct = o3d.io.read_point_cloud(MODEL_PATH)
         
-        if len(pcd_direct.points) > 0:
+        def reconstruct():
+            pcd_direct = o3d.io.read_point_cloud(model_path)
+            if len(pcd_direct.points) == 0:
+                raise RuntimeError(f"Could not load model from {model_path}. Check file path!")
             print("Creating mesh from point cloud...")
             pcd_direct.estimate_normals()
             mesh, _ = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(pcd_direct, depth=8)
             mesh.compute_vertex_normals()
-        else:
-            raise RuntimeError(f"Could not load model from {MODEL_PATH}. Check file path!")
+            return mesh
+        
+        return cached("mesh", source, "poisson_from_points", reconstruct, depth=8)
+    
+    if not mesh.has_vertex_normals():
+        mesh.compute_vertex_normals()
+    return mesh, artifacts.stage_key("load", source) if source else None
+
+
+def load_large_scan(model_path, source):
+    """(mesh, key) for a point cloud too large to load: stream, downsample, reconstruct"""
+    print(f"\nNote: {ply_stream.file_size_mb(model_path):.0f} MB point cloud. Streaming it "
+          f"({STREAM_METHOD} downsampling to at most {STREAM_MAX_POINTS} points)...")
+    scan, scan_key = cached("arrays", source, "stream",
+                            lambda: ply_stream.stream_point_cloud(model_path, STREAM_MAX_POINTS,
+                                                                  STREAM_MEMORY_MB, STREAM_METHOD),
+                            max_points=STREAM_MAX_POINTS, memory_mb=STREAM_MEMORY_MB, method=STREAM_METHOD)
+    pcd = artifacts.pointcloud_from_arrays(scan)
+    remember(pcd, scan_key)
+    # the index starts with the full-resolution bounds and is reused from step 2 on
+    index = attach_index(pcd, SpatialIndex(np.asarray(pcd.points), bounds=scan["bounds"]))
+    
+    low, high = scan["bounds"]
+    print(f"  Points in file: {int(scan['count'])}, kept: {len(pcd.points)}")
+    print(f"  Bounds: {low} - {high}")
+    
+    def reconstruct():
+        print("Creating mesh from point cloud...")
+        source_pcd = pcd
+        if not pcd.has_normals():
+            # on a copy: the step 2 cloud stays as streamed, step 3 estimates its own normals
+            source_pcd = o3d.geometry.PointCloud(pcd)
+            source_pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamKNN(knn=30))
+            source_pcd.orient_normals_consistent_tangent_plane(k=15)
+        mesh, _ = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(source_pcd, depth=8)
+        mesh.compute_vertex_normals()
+        return mesh
+    
+    mesh, key = cached("mesh", scan_key, "poisson_from_points", reconstruct, depth=8, max_nn=30, k=15,
+                       normals="open3d")
+    _scans[id(mesh)] = (mesh, pcd, scan)
+    return mesh, key
+
+
+def step1_load_and_visualize(model_path=MODEL_PATH):
+    print_separator(1, "Loading and Visualization")
+    
+    _lineage.clear()
+    _indexes.clear()
+    _scans.clear()
+    _pyramids.clear()
+    source = artifacts.file_digest(model_path) if get_cache() else None
+    
+    if ply_stream.is_point_cloud(model_path) and ply_stream.file_size_mb(model_path) > STREAM_THRESHOLD_MB:
+        mesh, key = load_large_scan(model_path, source)
     else:
-        if not mesh.has_vertex_normals():
-            mesh.compute_vertex_normals()
+        mesh, key = load_model(model_path, source)
+    remember(mesh, key)
     
     print("\nModel loaded successfully!")
     print_mesh_info(mesh, "Original Model")
     
-    print("\n>>> Opening visualization window...")
-    print(">>> Close window to continue")
-    o3d.visualization.draw_geometries([mesh], 
-                                      window_name="Step 1: Original Model",
-                                      width=1024, height=768)
+    show([mesh], "Step 1: Original Model")
     
     return mesh
 
@@ -84,16 +309,21 @@ def step1_load_and_visualize():
 def step2_convert_to_pointcloud(mesh):
     print_separator(2, "Conversion to Point Cloud")
     
-    pcd = mesh.sample_points_uniformly(number_of_points=10000)
+    scan = _scans.get(id(mesh))
+    if scan and scan[0] is mesh:
+        # a streamed scan already is a point cloud, with its index attached by load_large_scan
+        _, pcd, stats = scan
+        print(f"\nUsing the streamed scan ({len(pcd.points)} of {int(stats['count'])} points)")
+    else:
+        pcd, key = cached("pointcloud", key_of(mesh), "sample_uniformly",
+                          lambda: mesh.sample_points_uniformly(number_of_points=10000),
+                          number_of_points=10000)
+        remember(pcd, key)
     
     print("\nConverted to point cloud!")
     print_pointcloud_info(pcd, "Point Cloud")
     
-    print("\n>>> Opening visualization window...")
-    print(">>> Close window to continue")
-    o3d.visualization.draw_geometries([pcd], 
-                                      window_name="Step 2: Point Cloud",
-                                      width=1024, height=768)
+    show([pcd], "Step 2: Point Cloud")
     
     return pcd
 
@@ -104,30 +334,41 @@ def step2_convert_to_pointcloud(mesh):
 def step3_surface_reconstruction(pcd):
     print_separator(3, "Surface Reconstruction from Point Cloud")
     
-    print("\nEstimating normals...")
-    pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(
-        radius=0.1, max_nn=30))
-    pcd.orient_normals_consistent_tangent_plane(k=15)
+    index = spatial_index(pcd)
+    
+    def estimate_normals():
+        print("\nEstimating normals...")
+        pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(
+            radius=0.1, max_nn=30))
+        pcd.orient_normals_consistent_tangent_plane(k=15)
+        return {"normals": np.asarray(pcd.normals).copy()}
+    
+    normals, normals_key = cached("arrays", key_of(pcd), "normals", estimate_normals,
+                                  radius=0.1, max_nn=30, k=15)
+    pcd.normals = o3d.utility.Vector3dVector(normals["normals"])
+    
+    def reconstruct():
+        print("Performing Poisson reconstruction...")
+        mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
+            pcd, depth=9)
+        return dict(artifacts.mesh_arrays(mesh), densities=np.asarray(densities))
     
-    print("Performing Poisson reconstruction...")
-    mesh_recon, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
-        pcd, depth=9)
+    # the density cut and crop below are cheap, so they are not part of the key
+    recon, _ = cached("arrays", normals_key, "poisson", reconstruct, depth=9)
+    mesh_recon = artifacts.mesh_from_arrays(recon)
+    densities = recon["densities"]
     
     print("Removing artifacts...")
     vertices_to_remove = densities < np.quantile(densities, 0.05)
     mesh_recon.remove_vertices_by_mask(vertices_to_remove)
     
-    bbox = pcd.get_axis_aligned_bounding_box()
+    bbox = o3d.geometry.AxisAlignedBoundingBox(*index.bounds)
     mesh_cropped = mesh_recon.crop(bbox)
     mesh_cropped.compute_vertex_normals()
     
     print_mesh_info(mesh_cropped, "Reconstructed Surface")
     
-    print("\n>>> Opening visualization window...")
-    print(">>> Close window to continue")
-    o3d.visualization.draw_geometries([mesh_cropped], 
-                                      window_name="Step 3: Reconstructed Surface",
-                                      width=1024, height=768)
+    show([mesh_cropped], "Step 3: Reconstructed Surface")
     
     return mesh_cropped
 
@@ -139,8 +380,8 @@ def step4_voxelization(pcd):
     print_separator(4, "Voxelization")
     
     # Adaptive voxel size based on model dimensions
-    bbox = pcd.get_axis_aligned_bounding_box()
-    extent = bbox.get_extent()
+    index = spatial_index(pcd)
+    extent = index.extent
     max_dimension = max(extent)
     
     # Use 1/100 of the largest dimension for good detail
@@ -149,17 +390,15 @@ def step4_voxelization(pcd):
     print(f"\nModel bounding box extent: {extent}")
     print(f"Max dimension: {max_dimension:.4f}")
     print(f"Auto-calculated voxel size: {voxel_size:.6f}")
-    print(f"Creating voxel grid...")
+    print(f"Building voxel pyramid...")
     
-    voxel_grid = o3d.geometry.VoxelGrid.create_from_point_cloud(pcd, voxel_size=voxel_size)
+    pyramid = voxel_pyramid(pcd, voxel_size)
+    voxel_grid = pyramid.grid(min(VOXEL_FINER_LEVELS, len(pyramid) - 1))
     
+    print_pyramid_info(pyramid)
     print_voxel_info(voxel_grid, "Voxel Grid")
     
-    print("\n>>> Opening visualization window...")
-    print(">>> Close window to continue")
-    o3d.visualization.draw_geometries([voxel_grid],
-                                      window_name="Step 4: Voxelization",
-                                      width=1024, height=768)
+    show([voxel_grid], "Step 4: Voxelization")
     
     return voxel_grid
 
@@ -170,8 +409,9 @@ def step4_voxelization(pcd):
 def step5_add_plane(pcd):
     print_separator(5, "Adding a Plane")
     
-    center = pcd.get_center()
-    extent = pcd.get_max_bound() - pcd.get_min_bound()
+    index = spatial_index(pcd)
+    center = index.center.copy()
+    extent = index.extent
     
     plane_height = extent[1] * 1.5
     plane_depth = extent[2] * 1.5
@@ -188,16 +428,10 @@ def step5_add_plane(pcd):
     plane.paint_uniform_color([1.0, 0.3, 0.0])
     plane.compute_vertex_normals()
     
-    pcd_with_plane = copy.deepcopy(pcd)
-    
     print(f"\nPlane created: 0.002 x {plane_height:.3f} x {plane_depth:.3f}")
     print(f"Position (center): {plane_center}")
     
-    print("\n>>> Opening visualization window...")
-    print(">>> Close window to continue")
-    o3d.visualization.draw_geometries([pcd_with_plane, plane], 
-                                      window_name="Step 5: Object with Plane",
-                                      width=1024, height=768)
+    show([pcd, plane], "Step 5: Object with Plane")
     
     return center
 
@@ -205,37 +439,23 @@ def step5_add_plane(pcd):
 # ========================================
 # STEP 6: Surface Clipping
 # ========================================
-def step6_surface_clipping(pcd, plane_center):
+def step6_surface_clipping(pcd, plane_center, halfspaces=None):
     print_separator(6, "Surface Clipping")
     
-    points = np.asarray(pcd.points)
-    
-    plane_normal = np.array([1, 0, 0])
-    plane_point = plane_center
-    
-    distances = np.dot(points - plane_point, plane_normal)
-    mask = distances < 0
-    
-    pcd_clipped = o3d.geometry.PointCloud()
-    pcd_clipped.points = o3d.utility.Vector3dVector(points[mask])
+    # Default region: plane with normal [1, 0, 0] through the plane center.
+    # Any list of half-spaces works, e.g. clipping.box(low, high).
+    if halfspaces is None:
+        halfspaces = [clipping.halfspace([1, 0, 0], plane_center)]
     
-    if pcd.has_colors():
-        colors = np.asarray(pcd.colors)
-        pcd_clipped.colors = o3d.utility.Vector3dVector(colors[mask])
-    
-    if pcd.has_normals():
-        normals = np.asarray(pcd.normals)
-        pcd_clipped.normals = o3d.utility.Vector3dVector(normals[mask])
+    index = spatial_index(pcd)
+    pcd_clipped, kept = clipping.clip(pcd, halfspaces, index)
+    attach_index(pcd_clipped, index.subset(kept, np.asarray(pcd_clipped.points)))
     
     print_pointcloud_info(pcd_clipped, "Clipped Point Cloud")
     print(f"  Points removed: {len(pcd.points) - len(pcd_clipped.points)}")
     print(f"  Points remaining: {len(pcd_clipped.points)}")
     
-    print("\n>>> Opening visualization window...")
-    print(">>> Close window to continue")
-    o3d.visualization.draw_geometries([pcd_clipped], 
-                                      window_name="Step 6: Clipped Point Cloud",
-                                      width=1024, height=768)
+    show([pcd_clipped], "Step 6: Clipped Point Cloud")
     
     return pcd_clipped
 
@@ -246,16 +466,15 @@ def step6_surface_clipping(pcd, plane_center):
 def step7_color_and_extremes(pcd_clipped):
     print_separator(7, "Color and Extremes")
     
-    points = np.asarray(pcd_clipped.points)
+    index = spatial_index(pcd_clipped)
+    points = index.points
     
     axis = 2  # 0=X, 1=Y, 2=Z
     axis_name = ['X', 'Y', 'Z'][axis]
     
-    min_value = points[:, axis].min()
-    max_value = points[:, axis].max()
-    
-    min_idx = np.argmin(points[:, axis])
-    max_idx = np.argmax(points[:, axis])
+    min_idx, max_idx = index.extremes(axis)
+    min_value = points[min_idx, axis]
+    max_value = points[max_idx, axis]
     min_point = points[min_idx]
     max_point = points[max_idx]
     
@@ -268,7 +487,8 @@ def step7_color_and_extremes(pcd_clipped):
     colors[:, 0] = normalized
     colors[:, 2] = 1 - normalized
     
-    pcd_colored = copy.deepcopy(pcd_clipped)
+    # colors go straight into the clipped cloud, no copy
+    pcd_colored = pcd_clipped
     pcd_colored.colors = o3d.utility.Vector3dVector(colors)
     
     sphere_min = o3d.geometry.TriangleMesh.create_sphere(radius=0.01)
@@ -284,11 +504,7 @@ def step7_color_and_extremes(pcd_clipped):
     print(f"\nGradient applied! Colors: blue (min) to red (max)")
     print(f"Extremes highlighted: green (min), yellow (max)")
     
-    print("\n>>> Opening visualization window...")
-    print(">>> Close window to finish")
-    o3d.visualization.draw_geometries([pcd_colored, sphere_min, sphere_max], 
-                                      window_name="Step 7: Color Gradient & Extremes",
-                                      width=1024, height=768)
+    show([pcd_colored, sphere_min, sphere_max], "Step 7: Color Gradient & Extremes", closing="finish")
     
     return pcd_colored
 
@@ -301,10 +517,11 @@ def main():
     print("  ASSIGNMENT 5 - 3D VISUALIZATION WITH OPEN3D")
     print("="*80)
     print(f"\nModel path: {MODEL_PATH}")
-    print("\nNote: Visualization window will open after each step.")
-    print("Close the window to proceed to the next step.\n")
-    
-    input("Press Enter to start...")
+    if VISUALIZE:
+        print("\nNote: Visualization window will open after each step.")
+        print("Close the window to proceed to the next step.\n")
+        
+        input("Press Enter to start...")
     
     # Step 1: Load and visualize
     mesh = step1_load_and_visualize()
@@ -327,6 +544,9 @@ def main():
     # Step 7: Color and extremes
     step7_color_and_extremes(pcd_clipped)
     
+    print_index_info(spatial_index(pcd), "Spatial Index (point cloud)")
+    print_index_info(spatial_index(pcd_clipped), "Spatial Index (clipped point cloud)")
+    
     print("\n" + "="*80)
     print("\nSummary:")
     print("✓ Step 1: Loaded and visualized 3D model")
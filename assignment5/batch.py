@@ -0,0 +1,226 @@
+"""Run steps 1-7 of assignment5.py over many models without any windows.
+
+    python batch.py models/ --out results --workers 4
+    python batch.py "scans/**/*.ply" --out results
+
+For every model a folder <out>/<model name>/ gets the intermediate geometries,
+log.txt with the step output and stats.json with the statistics and wall time
+of each step. <out>/summary.json collects the stats of all models. A model
+whose worker process dies is recorded as failed and the others are retried.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import multiprocessing as mp
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+STEPS = ["step1", "step2", "step3", "step4", "step5", "step6", "step7"]
+
+
+def find_models(sources):
+    """.ply files from directories (searched recursively) and glob patterns"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths += glob.glob(os.path.join(source, "**", "*.ply"), recursive=True)
+        else:
+            paths += glob.glob(source, recursive=True)
+    return sorted(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+
+def output_names(paths):
+    """Folder name per model: file name without extension, numbered on clashes"""
+    names, seen = {}, {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        names[path] = stem if seen[stem] == 1 else f"{stem}_{seen[stem]}"
+    return names
+
+
+def run_model(model_path, out_dir, cache_dir=".artifacts", cache_mb=2048, stream_memory_mb=1024):
+    """Run the whole pipeline on one model; returns its stats dict"""
+    import open3d as o3d
+    import assignment5 as a5
+
+    a5.VISUALIZE = False
+    a5.CACHE_DIR, a5.CACHE_MAX_MB = cache_dir, cache_mb
+    a5.STREAM_MEMORY_MB = stream_memory_mb
+    cache = a5.get_cache()
+    hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+    os.makedirs(out_dir, exist_ok=True)
+    stats = {"model": model_path, "status": "ok", "steps": {}}
+    started = time.perf_counter()
+
+    def timed(name, fn, *args):
+        t = time.perf_counter()
+        result = fn(*args)
+        stats["steps"][name] = {"seconds": round(time.perf_counter() - t, 4)}
+        return result
+
+    def save(name, filename, info, write, geometry):
+        write(os.path.join(out_dir, filename), geometry)
+        stats["steps"][name].update(info, output=filename)
+
+    with open(os.path.join(out_dir, "log.txt"), "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        try:
+            mesh = timed("step1", a5.step1_load_and_visualize, model_path)
+            save("step1", "step1_mesh.ply", a5.mesh_info(mesh), o3d.io.write_triangle_mesh, mesh)
+            scan = a5.scan_info(mesh)
+            if scan:
+                stats["steps"]["step1"]["scan"] = scan
+
+            pcd = timed("step2", a5.step2_convert_to_pointcloud, mesh)
+            save("step2", "step2_pointcloud.ply", a5.pointcloud_info(pcd), o3d.io.write_point_cloud, pcd)
+
+            mesh_recon = timed("step3", a5.step3_surface_reconstruction, pcd)
+            save("step3", "step3_reconstruction.ply", a5.mesh_info(mesh_recon),
+                 o3d.io.write_triangle_mesh, mesh_recon)
+
+            voxel_grid = timed("step4", a5.step4_voxelization, pcd)
+            save("step4", "step4_voxels.ply", a5.voxel_info(voxel_grid), o3d.io.write_voxel_grid, voxel_grid)
+            stats["steps"]["step4"]["pyramid"] = a5.voxel_pyramid(pcd).info()
+
+            plane_center = timed("step5", a5.step5_add_plane, pcd)
+            stats["steps"]["step5"]["plane_center"] = [float(v) for v in plane_center]
+
+            pcd_clipped = timed("step6", a5.step6_surface_clipping, pcd, plane_center)
+            save("step6", "step6_clipped.ply", a5.pointcloud_info(pcd_clipped),
+                 o3d.io.write_point_cloud, pcd_clipped)
+
+            pcd_colored = timed("step7", a5.step7_color_and_extremes, pcd_clipped)
+            save("step7", "step7_colored.ply", a5.pointcloud_info(pcd_colored),
+                 o3d.io.write_point_cloud, pcd_colored)
+            stats["spatial_index"] = {"pointcloud": a5.spatial_index(pcd).info(),
+                                      "clipped": a5.spatial_index(pcd_clipped).info()}
+        except Exception as e:
+            traceback.print_exc()
+            stats["status"] = "failed"
+            stats["error"] = f"{type(e).__name__}: {e}"
+
+    stats["total_seconds"] = round(time.perf_counter() - started, 4)
+    if cache:
+        stats["cache"] = {"hits": cache.hits - hits, "misses": cache.misses - misses}
+    with open(os.path.join(out_dir, "stats.json"), "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+
+def failed_stats(model_path, out_dir, error):
+    """Stats of a model whose worker process died or whose result never came back"""
+    stats = {"model": model_path, "status": "failed", "steps": {}, "error": error, "total_seconds": 0.0}
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "stats.json"), "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+
+def print_timings(results):
+    """Per-step wall time of every model plus the total over all models"""
+    header = f"{'model':<30}" + "".join(f"{s:>9}" for s in STEPS) + f"{'total':>10}  status"
+    print("\n" + header)
+    print("-" * len(header))
+    totals = dict.fromkeys(STEPS, 0.0)
+    for name, stats in sorted(results.items()):
+        cells = ""
+        for step in STEPS:
+            seconds = stats["steps"].get(step, {}).get("seconds")
+            totals[step] += seconds or 0.0
+            cells += f"{seconds:>9.2f}" if seconds is not None else f"{'-':>9}"
+        print(f"{name[:30]:<30}{cells}{stats['total_seconds']:>10.2f}  {stats['status']}")
+    print("-" * len(header))
+    print(f"{'sum':<30}" + "".join(f"{totals[s]:>9.2f}" for s in STEPS)
+          + f"{sum(s['total_seconds'] for s in results.values()):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch run of the assignment5 pipeline")
+    parser.add_argument("inputs", nargs="+", help="directories with .ply files or glob patterns")
+    parser.add_argument("--out", default="results", help="output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parallel processes")
+    parser.add_argument("--cache-dir", default=".artifacts",
+                        help="artifact cache shared by the workers (see artifacts.py)")
+    parser.add_argument("--cache-mb", type=float, default=2048, help="artifact cache size limit")
+    parser.add_argument("--no-cache", action="store_true", help="always recompute every stage")
+    parser.add_argument("--memory-mb", type=float, default=1024,
+                        help="memory for streaming large point clouds, per worker")
+    parser.add_argument("--skip-done", action="store_true",
+                        help="skip models whose stats.json already has status ok")
+    args = parser.parse_args()
+
+    models = find_models(args.inputs)
+    if not models:
+        parser.error("no .ply files found")
+    names = output_names(models)
+
+    results, todo = {}, []
+    for path in models:
+        stats_path = os.path.join(args.out, names[path], "stats.json")
+        if args.skip_done and os.path.exists(stats_path):
+            with open(stats_path, encoding="utf-8") as f:
+                stats = json.load(f)
+            if stats.get("status") == "ok":
+                results[names[path]] = stats
+                continue
+        todo.append(path)
+
+    print(f"{len(models)} models, {len(todo)} to process, {args.workers} workers -> {args.out}")
+    started = time.perf_counter()
+    cache_dir = None if args.no_cache else args.cache_dir
+    pending, isolated, done = list(todo), False, 0
+    try:
+        while pending:
+            crashed = []
+            # after a worker died the rest runs one model at a time, so the next crash names its model
+            # spawn: Open3D keeps its own thread pools, forking them is not safe
+            with ProcessPoolExecutor(max_workers=1 if isolated else args.workers,
+                                     mp_context=mp.get_context("spawn")) as pool:
+                futures = {pool.submit(run_model, path, os.path.join(args.out, names[path]), cache_dir,
+                                       args.cache_mb, args.memory_mb): path
+                           for path in pending}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        stats = future.result()
+                    except BrokenProcessPool:
+                        crashed.append(path)
+                        continue
+                    except Exception as e:
+                        stats = failed_stats(path, os.path.join(args.out, names[path]), f"{type(e).__name__}: {e}")
+                    done += 1
+                    results[names[path]] = stats
+                    cached = f", cache {stats['cache']['hits']}/{stats['cache']['hits'] + stats['cache']['misses']}" \
+                        if "cache" in stats else ""
+                    print(f"[{done}/{len(todo)}] {names[path]}: {stats['status']} in {stats['total_seconds']:.1f}s{cached}")
+
+            crashed.sort(key=pending.index)
+            if isolated and crashed:
+                # one worker runs the models in submission order: the first one lost is the one that crashed it
+                path = crashed.pop(0)
+                done += 1
+                results[names[path]] = failed_stats(path, os.path.join(args.out, names[path]),
+                                                    "worker process died (BrokenProcessPool)")
+                print(f"[{done}/{len(todo)}] {names[path]}: failed, worker process died")
+            elif crashed:
+                print(f"A worker process died, retrying {len(crashed)} models one at a time")
+            pending, isolated = crashed, isolated or bool(crashed)
+    finally:
+        os.makedirs(args.out, exist_ok=True)
+        with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    print_timings(results)
+    print(f"\nWall time: {time.perf_counter() - started:.1f}s")
+    failed = [name for name, stats in results.items() if stats["status"] != "ok"]
+    if failed:
+        print(f"Failed: {', '.join(sorted(failed))}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Time and peak memory of clipping large clouds: the old step 6 against clipping.py.
+
+    python bench_clipping.py --points 20000000
+
+Every method runs in a fresh process on the same synthetic cloud (points,
+colors and normals). Peak memory is the growth of the process high-water mark
+over the resident size after the cloud was built (Linux /proc).
+
+  old           mask, three Vector3dVector copies, deepcopy for recolouring
+  plane         clip_mask for one plane + select_by_index
+  plane-index   argsort of X in the SpatialIndex, binary search + select_by_index
+  box           six half-spaces in one pass + select_by_index
+"""
+import argparse
+import copy
+import multiprocessing as mp
+import time
+
+METHODS = ["old", "plane", "plane-index", "box"]
+
+
+def memory_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def reset_peak():
+    """Make VmHWM start again from the current resident size"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def make_cloud(n, seed=0):
+    import numpy as np
+    import open3d as o3d
+
+    rng = np.random.default_rng(seed)
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(rng.uniform(-1, 1, (n, 3)))
+    pcd.colors = o3d.utility.Vector3dVector(rng.uniform(0, 1, (n, 3)))
+    pcd.normals = o3d.utility.Vector3dVector(rng.normal(size=(n, 3)))
+    return pcd
+
+
+def run(method, n):
+    import numpy as np
+    import open3d as o3d
+    import clipping
+    from spatial import SpatialIndex
+
+    pcd = make_cloud(n)
+    index = SpatialIndex(np.asarray(pcd.points))
+    plane = [clipping.halfspace([1, 0, 0], [0.0, 0.0, 0.0])]
+
+    reset_peak()
+    baseline = memory_kb("VmRSS")
+    started = time.perf_counter()
+    if method == "old":
+        points = np.asarray(pcd.points)
+        mask = np.dot(points - np.zeros(3), np.array([1, 0, 0])) < 0
+        clipped = o3d.geometry.PointCloud()
+        clipped.points = o3d.utility.Vector3dVector(points[mask])
+        clipped.colors = o3d.utility.Vector3dVector(np.asarray(pcd.colors)[mask])
+        clipped.normals = o3d.utility.Vector3dVector(np.asarray(pcd.normals)[mask])
+        clipped = copy.deepcopy(clipped)
+    elif method == "plane":
+        clipped, _ = clipping.clip(pcd, plane)
+    elif method == "plane-index":
+        index.order(0)  # nothing else in the pipeline sorts by X, so the sort is part of the cost
+        clipped, _ = clipping.clip(pcd, plane, index)
+    else:
+        clipped, _ = clipping.clip(pcd, clipping.box([-0.5] * 3, [0.5] * 3))
+    seconds = time.perf_counter() - started
+    return seconds, max(memory_kb("VmHWM") - baseline, 0), len(clipped.points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark point cloud clipping")
+    parser.add_argument("--points", type=int, default=20_000_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=METHODS)
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    print(f"{args.points:,} points, {args.runs} runs per method\n")
+    print(f"{'method':<14}{'best s':>10}{'peak MB':>10}{'kept':>14}")
+    for method in args.methods:
+        results = []
+        for _ in range(args.runs):
+            with ctx.Pool(1) as pool:
+                results.append(pool.apply(run, (method, args.points)))
+        seconds = min(r[0] for r in results)
+        peak = max(r[1] for r in results) / 1024
+        print(f"{method:<14}{seconds:>10.3f}{peak:>10.0f}{results[0][2]:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Clipping a point cloud by any number of half-spaces in one pass.
+
+A half-space is (normal, point) and keeps the points p with
+dot(p - point, normal) < 0, the same rule as the original step 6. A convex
+region is the intersection of half-spaces (box() and convex_hull() build
+them). All planes are tested together on chunks of points, which gives one
+boolean mask; the clipped cloud is then made with one select_by_index
+gather that carries points, colours and normals together.
+"""
+import numpy as np
+
+CHUNK = 1 << 20  # points per block of plane tests; bounds the temporary arrays
+
+
+def halfspace(normal, point):
+    return np.asarray(normal, dtype=float), np.asarray(point, dtype=float)
+
+
+def box(low, high):
+    """Six half-spaces keeping low < p < high"""
+    low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+    return [halfspace(sign * np.eye(3)[axis], corner)
+            for axis in range(3) for sign, corner in ((-1, low), (1, high))]
+
+
+def convex_hull(vertices):
+    """Half-spaces of the convex hull of vertices (inside = kept)"""
+    from scipy.spatial import ConvexHull
+
+    hull = ConvexHull(np.asarray(vertices, dtype=float))
+    # equations: normal . p + offset <= 0 inside, normal points out
+    return [(eq[:3], -eq[3] * eq[:3]) for eq in hull.equations]
+
+
+def as_planes(halfspaces):
+    """(m x 3 normals, m offsets) with keep = normals @ p < offsets"""
+    normals = np.array([n for n, _ in halfspaces], dtype=float).reshape(-1, 3)
+    offsets = np.array([n @ p for n, p in halfspaces], dtype=float)
+    return normals, offsets
+
+
+def clip_mask(points, halfspaces):
+    """Boolean mask of the points inside every half-space"""
+    normals, offsets = as_planes(halfspaces)
+    mask = np.empty(len(points), dtype=bool)
+    for start in range(0, len(points), CHUNK):
+        block = points[start:start + CHUNK]
+        np.all(block @ normals.T < offsets, axis=1, out=mask[start:start + CHUNK])
+    return mask
+
+
+def axis_plane(halfspaces):
+    """(axis, value) if the region is a single plane x/y/z < value, else None"""
+    if len(halfspaces) != 1:
+        return None
+    normal, point = halfspaces[0]
+    axis = int(np.argmax(np.abs(normal)))
+    if normal[axis] <= 0 or np.count_nonzero(normal) != 1:
+        return None
+    return axis, float(point[axis])
+
+
+def clip_indices(points, halfspaces, index=None):
+    """Sorted indices of the kept points.
+
+    A single axis-aligned plane is a binary search in the SpatialIndex
+    sorted order when an earlier step has already built that order; sorting
+    just for the clip costs far more than the plane test, so anything else
+    is one vectorised pass over the points.
+    """
+    plane = axis_plane(halfspaces) if index is not None else None
+    if plane is not None and index.has_order(plane[0]):
+        return index.below(*plane)
+    return np.flatnonzero(clip_mask(points, halfspaces))
+
+
+def clip(pcd, halfspaces, index=None):
+    """(clipped cloud, kept indices); all attributes go through one gather"""
+    points = index.points if index is not None else np.asarray(pcd.points)
+    kept = clip_indices(points, halfspaces, index)
+    return pcd.select_by_index(kept), kept
@@ -0,0 +1,260 @@
+"""Out-of-core reading of large binary PLY point clouds.
+
+The vertex block is memory-mapped and read chunk by chunk; only the current
+chunk and a downsampled cloud of at most max_points points are ever held in
+memory. Two ways of downsampling:
+
+  voxel      centroid (and mean colour/normal) of the points in each voxel;
+             the voxel size doubles whenever the cloud would exceed max_points
+  reservoir  uniform random sample of max_points points
+
+The bounding box and the extreme points along each axis of the full cloud are
+computed in the same pass. The result is a dict of numpy arrays, so it can go
+straight into the artifact cache.
+"""
+import mmap
+import os
+import sys
+
+import numpy as np
+
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+
+# bytes per point of the accumulated cloud (sums/count/key or sample + priority),
+# counted three times for the copies made while merging a chunk into it
+ACCUMULATOR_BYTES = 3 * 88
+# bytes per row of float64 temporaries made while processing a chunk
+WORK_BYTES = 256
+KEY_BITS = 21  # per axis in a packed voxel key
+KEY_LIMIT = 1 << (KEY_BITS - 1)
+
+
+def read_header(path):
+    """(format, [(element, count, [(property, type or None for lists)])], byte offset of the data)"""
+    elements = []
+    with open(path, "rb") as f:
+        if f.readline().strip() != b"ply":
+            raise ValueError(f"{path} is not a PLY file")
+        fmt = None
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{path}: PLY header has no end_header")
+            words = line.decode("ascii", "replace").split()
+            if not words or words[0] in ("comment", "obj_info"):
+                continue
+            if words[0] == "format":
+                fmt = words[1]
+            elif words[0] == "element":
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == "property":
+                prop_type = None if words[1] == "list" else words[1]
+                elements[-1][2].append((words[-1], prop_type))
+            elif words[0] == "end_header":
+                return fmt, elements, f.tell()
+
+
+def is_point_cloud(path):
+    """True for a binary PLY that has vertices and no faces"""
+    try:
+        fmt, elements, _ = read_header(path)
+    except (OSError, ValueError):
+        return False
+    counts = {name: count for name, count, _ in elements}
+    return fmt != "ascii" and counts.get("vertex", 0) > 0 and counts.get("face", 0) == 0
+
+
+def vertex_layout(path):
+    """(numpy dtype of one vertex, vertex count, byte offset of the vertex block)"""
+    fmt, elements, offset = read_header(path)
+    if fmt == "ascii":
+        raise ValueError(f"{path}: only binary PLY files can be streamed")
+    order = "<" if fmt == "binary_little_endian" else ">"
+    for name, count, props in elements:
+        if any(prop_type is None or prop_type not in PLY_TYPES for _, prop_type in props):
+            raise ValueError(f"{path}: element {name} has list or unknown properties")
+        dtype = np.dtype([(prop, order + PLY_TYPES[prop_type]) for prop, prop_type in props])
+        if name == "vertex":
+            return dtype, count, offset
+        offset += dtype.itemsize * count
+    raise ValueError(f"{path}: no vertex element")
+
+
+def chunk_rows(row_bytes, max_points, memory_mb):
+    """Rows per chunk so that chunk work plus the accumulated cloud stay under memory_mb"""
+    budget = int(memory_mb * 1024 * 1024) - max_points * ACCUMULATOR_BYTES
+    rows = budget // (row_bytes + WORK_BYTES)
+    if rows < 1024:
+        raise ValueError(f"memory cap of {memory_mb} MB is too small for {max_points} points")
+    return rows
+
+
+def _columns(block, names, scale=1.0):
+    if not all(name in block.dtype.names for name in names):
+        return None
+    return np.column_stack([block[name] for name in names]).astype(np.float64) / scale
+
+
+def pack_keys(keys):
+    """n x 3 integer voxel coordinates (|k| < 2**20) -> n int64 keys, ordered by x, then y, then z"""
+    shifted = keys + KEY_LIMIT
+    return (shifted[:, 0] << (2 * KEY_BITS)) | (shifted[:, 1] << KEY_BITS) | shifted[:, 2]
+
+
+def unpack_keys(packed):
+    mask = (1 << KEY_BITS) - 1
+    return np.column_stack([(packed >> (2 * KEY_BITS)) & mask, (packed >> KEY_BITS) & mask, packed & mask]) - KEY_LIMIT
+
+
+class VoxelAccumulator:
+    """Per-voxel sums and counts, keyed by packed integer voxel coordinates"""
+
+    def __init__(self, max_points, voxel_size=None):
+        self.max_points = max_points
+        self.voxel_size = voxel_size
+        self.origin = None
+        self.keys = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0)
+        self.sums = {}  # attribute -> (voxels x 3) sums
+
+    def _merge(self, keys, count, sums):
+        """Add per-voxel (keys, count, sums) to the accumulator, combining equal keys"""
+        keys = np.concatenate([self.keys, keys])
+        unique, inverse = np.unique(keys, return_inverse=True)
+        self.count = np.bincount(inverse, np.concatenate([self.count, count]), len(unique))
+        for name, values in sums.items():
+            values = np.concatenate([self.sums[name], values]) if name in self.sums else values
+            self.sums[name] = np.column_stack([np.bincount(inverse, values[:, c], len(unique)) for c in range(3)])
+        self.keys = unique
+
+    def _coarsen(self):
+        """Double the voxel size; voxel (i, j, k) goes into (i//2, j//2, k//2)"""
+        self.voxel_size *= 2
+        keys, count, sums = pack_keys(unpack_keys(self.keys) // 2), self.count, self.sums
+        self.keys, self.count, self.sums = np.empty(0, dtype=np.int64), np.empty(0), {}
+        self._merge(keys, count, sums)
+
+    def add(self, points, attributes):
+        if self.origin is None:
+            self.origin = points.min(axis=0)
+            if self.voxel_size is None:
+                # about max_points voxels if the chunk is a surface as large as the scan
+                extent = float((points.max(axis=0) - self.origin).max()) or 1.0
+                self.voxel_size = extent / np.sqrt(self.max_points)
+        while True:
+            keys = np.floor((points - self.origin) / self.voxel_size).astype(np.int64)
+            if np.abs(keys).max(initial=0) < KEY_LIMIT:
+                break
+            self._coarsen()
+        unique, inverse = np.unique(pack_keys(keys), return_inverse=True)
+        sums = {"points": points}
+        sums.update((name, values) for name, values in attributes.items() if values is not None)
+        chunk_sums = {name: np.column_stack([np.bincount(inverse, values[:, c], len(unique)) for c in range(3)])
+                      for name, values in sums.items()}
+        self._merge(unique, np.bincount(inverse, minlength=len(unique)).astype(np.float64), chunk_sums)
+        while len(self.keys) > self.max_points:
+            self._coarsen()
+
+    def result(self):
+        arrays = {name: values / self.count[:, None] for name, values in self.sums.items()}
+        if "normals" in arrays:
+            length = np.linalg.norm(arrays["normals"], axis=1, keepdims=True)
+            arrays["normals"] = arrays["normals"] / np.where(length > 0, length, 1.0)
+        arrays["voxel_size"] = np.float64(self.voxel_size)
+        return arrays
+
+
+class ReservoirAccumulator:
+    """Uniform sample without replacement: the max_points rows with the smallest random priority"""
+
+    def __init__(self, max_points, seed=0):
+        self.max_points = max_points
+        self.rng = np.random.default_rng(seed)
+        self.priority = np.empty(0)
+        self.rows = {}
+
+    def add(self, points, attributes):
+        priority = self.rng.random(len(points))
+        if len(self.priority) == self.max_points:
+            take = priority < self.priority.max()
+            if not take.any():
+                return
+            points, priority = points[take], priority[take]
+            attributes = {name: values[take] for name, values in attributes.items() if values is not None}
+        rows = {"points": points}
+        rows.update((name, values) for name, values in attributes.items() if values is not None)
+        priority = np.concatenate([self.priority, priority])
+        rows = {name: np.concatenate([self.rows[name], values]) if name in self.rows else values
+                for name, values in rows.items()}
+        if len(priority) > self.max_points:
+            keep = np.argpartition(priority, self.max_points - 1)[:self.max_points]
+            priority = priority[keep]
+            rows = {name: values[keep] for name, values in rows.items()}
+        self.priority, self.rows = priority, rows
+
+    def result(self):
+        return dict(self.rows)
+
+
+def stream_point_cloud(path, max_points=1_000_000, memory_mb=1024, method="voxel", voxel_size=None, seed=0):
+    """Downsampled cloud plus statistics of the full cloud, as a dict of arrays.
+
+    points/colors/normals  the downsampled cloud (colors and normals if the file has them)
+    count                  points in the file
+    bounds                 2 x 3: min and max corner of the full cloud
+    extremes               3 x 2 x 3: per axis, the points with the min and max coordinate
+    voxel_size             final voxel size (voxel method only)
+    """
+    dtype, count, offset = vertex_layout(path)
+    if count == 0:
+        raise ValueError(f"{path}: vertex element is empty")
+    if method == "voxel":
+        accumulator = VoxelAccumulator(max_points, voxel_size)
+    elif method == "reservoir":
+        accumulator = ReservoirAccumulator(max_points, seed)
+    else:
+        raise ValueError(f"unknown downsampling method {method!r}")
+    rows = chunk_rows(dtype.itemsize, max_points, memory_mb)
+    low, high = np.full(3, np.inf), np.full(3, -np.inf)
+    extremes = np.zeros((3, 2, 3))
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, count, rows):
+            n = min(rows, count - start)
+            begin = offset + start * dtype.itemsize
+            block = np.frombuffer(mm, dtype=dtype, count=n, offset=begin)
+            points = _columns(block, ("x", "y", "z"))
+            colors = _columns(block, ("red", "green", "blue"))
+            if colors is not None and block.dtype["red"].kind in "iu":
+                colors /= np.iinfo(block.dtype["red"]).max
+            normals = _columns(block, ("nx", "ny", "nz"))
+            del block  # the mmap can only be closed without live views
+
+            lowest, highest = points.argmin(axis=0), points.argmax(axis=0)
+            for axis in range(3):
+                if points[lowest[axis], axis] < low[axis]:
+                    low[axis] = points[lowest[axis], axis]
+                    extremes[axis, 0] = points[lowest[axis]]
+                if points[highest[axis], axis] > high[axis]:
+                    high[axis] = points[highest[axis], axis]
+                    extremes[axis, 1] = points[highest[axis]]
+            accumulator.add(points, {"colors": colors, "normals": normals})
+            del points, colors, normals
+
+            # the chunk is done, let the kernel drop its pages from our resident set
+            if hasattr(mm, "madvise") and sys.platform.startswith("linux"):
+                page_start = begin - begin % mmap.PAGESIZE
+                mm.madvise(mmap.MADV_DONTNEED, page_start, begin + n * dtype.itemsize - page_start)
+
+    arrays = accumulator.result()
+    arrays.update(count=np.int64(count), bounds=np.array([low, high]), extremes=extremes)
+    return arrays
+
+
+def file_size_mb(path):
+    return os.path.getsize(path) / (1024 * 1024)
@@ -0,0 +1,124 @@
+"""One spatial index per point cloud, shared by the steps of assignment5.py.
+
+The KD-tree (scipy cKDTree) is built once, on first use, and answers the
+radius/kNN lookups of the pipeline. Normals are still estimated and oriented
+by Open3D, so the step 3 reconstruction matches the original. Bounds, centre
+and per-axis sorted orders are computed once as well, so clipping along an
+already sorted axis is a binary search instead of a scan. The index assumes
+the points do not change after it is built.
+"""
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class SpatialIndex:
+    def __init__(self, points, bounds=None):
+        """bounds: (min corner, max corner) if already known, e.g. from ply_stream"""
+        self.points = np.asarray(points)
+        self.timings = {}  # name -> [calls, seconds]
+        self._tree = None
+        self._bounds = None if bounds is None else (np.asarray(bounds[0]), np.asarray(bounds[1]))
+        self._center = None
+        self._order = {}  # axis -> point indices sorted by that coordinate
+        self._knn = {}  # k -> (distances, indices) for all points
+
+    def __len__(self):
+        return len(self.points)
+
+    @contextmanager
+    def timed(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.timings.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - started
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            with self.timed("build"):
+                self._tree = cKDTree(self.points)
+        return self._tree
+
+    @property
+    def bounds(self):
+        """(min corner, max corner)"""
+        if self._bounds is None:
+            with self.timed("bounds"):
+                self._bounds = (self.points.min(axis=0), self.points.max(axis=0))
+        return self._bounds
+
+    @property
+    def extent(self):
+        low, high = self.bounds
+        return high - low
+
+    @property
+    def center(self):
+        if self._center is None:
+            self._center = self.points.mean(axis=0)
+        return self._center
+
+    def order(self, axis):
+        """Point indices sorted by the coordinate on axis"""
+        if axis not in self._order:
+            with self.timed("sort"):
+                self._order[axis] = np.argsort(self.points[:, axis], kind="stable")
+        return self._order[axis]
+
+    def has_order(self, axis):
+        """Whether the sorted order on axis is already built"""
+        return axis in self._order
+
+    def knn(self, k):
+        """(distances, indices) of the k nearest points of every point, itself included"""
+        if k not in self._knn:
+            tree = self.tree
+            with self.timed("knn"):
+                self._knn[k] = tree.query(self.points, k=k, workers=-1)
+        return self._knn[k]
+
+    def query(self, points, k, radius=np.inf):
+        """Up to k neighbours within radius of each point; missing ones get index len(self)"""
+        tree = self.tree
+        with self.timed("query"):
+            return tree.query(points, k=k, distance_upper_bound=radius, workers=-1)
+
+    def radius(self, point, radius):
+        """Indices of the points within radius of point"""
+        tree = self.tree
+        with self.timed("radius"):
+            return np.asarray(tree.query_ball_point(point, radius), dtype=np.int64)
+
+    def below(self, axis, value):
+        """Indices (in point order) of the points whose coordinate on axis is < value"""
+        order = self.order(axis)
+        with self.timed("clip"):
+            count = np.searchsorted(self.points[order, axis], value, side="left")
+            return np.sort(order[:count])
+
+    def extremes(self, axis):
+        """(index of the minimum, index of the maximum) along axis; the first one on ties"""
+        with self.timed("extremes"):
+            values = self.points[:, axis]
+            return int(np.argmin(values)), int(np.argmax(values))
+
+    def subset(self, kept, points=None):
+        """Index over points[kept]; sorted orders carry over without re-sorting"""
+        sub = SpatialIndex(self.points[kept] if points is None else points)
+        position = np.full(len(self.points), -1, dtype=np.int64)
+        position[kept] = np.arange(len(kept))
+        for axis, order in self._order.items():
+            moved = position[order]
+            sub._order[axis] = moved[moved >= 0]
+        return sub
+
+    def info(self):
+        """Point count and {operation: (calls, seconds)}"""
+        return {"points": len(self.points),
+                "timings": {name: (calls, round(seconds, 6)) for name, (calls, seconds) in self.timings.items()}}
@@ -0,0 +1,97 @@
+"""Multi-resolution voxel pyramid of a point cloud.
+
+The points are scanned once, for level 0 (the finest voxels). Level k+1 is
+made from level k: integer voxel coordinates shift right by one bit, so eight
+voxels merge into one and their counts and colour sums add up. Any level, or
+the voxels of a level inside a box, then comes from the level's voxel arrays
+without touching the points again.
+"""
+from collections import namedtuple
+
+import numpy as np
+import open3d as o3d
+
+from ply_stream import KEY_LIMIT, pack_keys, unpack_keys
+
+# keys: voxels x 3 integer coordinates, count: points per voxel, color_sum: voxels x 3 or None
+Level = namedtuple("Level", ["keys", "count", "color_sum"])
+
+
+def _reduce(keys, count, color_sum):
+    unique, inverse = np.unique(pack_keys(keys), return_inverse=True)
+    size = len(unique)
+    if color_sum is not None:
+        color_sum = np.column_stack([np.bincount(inverse, color_sum[:, c], size) for c in range(3)])
+    return Level(unpack_keys(unique), np.bincount(inverse, count, size), color_sum)
+
+
+class VoxelPyramid:
+    def __init__(self, points, voxel_size, origin, levels=10, colors=None):
+        """voxel_size: edge of the finest voxels; origin: corner of voxel (0, 0, 0), <= every point.
+
+        A cloud without points (e.g. clipped away entirely) gives one empty level.
+        """
+        self.voxel_size = float(voxel_size)
+        self.origin = np.asarray(origin, dtype=float)
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if not len(points):
+            color_sum = None if colors is None else np.zeros((0, 3))
+            self.levels = [Level(np.zeros((0, 3), dtype=np.int64), np.zeros(0), color_sum)]
+            return
+        keys = np.floor((points - self.origin) / self.voxel_size).astype(np.int64)
+        if keys.min() < 0 or keys.max() >= KEY_LIMIT:
+            raise ValueError("points outside the pyramid origin/extent, or voxels too small")
+        self.levels = [_reduce(keys, np.ones(len(keys)), None if colors is None else np.asarray(colors))]
+        while len(self.levels) < levels and len(self.levels[-1].keys) > 1:
+            finer = self.levels[-1]
+            self.levels.append(_reduce(finer.keys >> 1, finer.count, finer.color_sum))
+
+    def __len__(self):
+        return len(self.levels)
+
+    def size(self, level):
+        """Voxel edge length on a level"""
+        return self.voxel_size * (1 << level)
+
+    def level_for(self, resolution):
+        """Coarsest level whose voxels are not larger than resolution (level 0 if none is)"""
+        level = int(np.floor(np.log2(max(resolution / self.voxel_size, 1.0)) + 1e-9))
+        return min(level, len(self.levels) - 1)
+
+    def grid(self, level, mask=None):
+        """Open3D VoxelGrid of a level, or of the voxels selected by mask"""
+        voxels = self.levels[level]
+        size = self.size(level)
+        if not len(voxels.keys):
+            empty = o3d.geometry.VoxelGrid()
+            empty.voxel_size = size
+            empty.origin = self.origin
+            return empty
+        keys = voxels.keys if mask is None else voxels.keys[mask]
+        pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(self.origin + (keys + 0.5) * size))
+        if voxels.color_sum is not None:
+            colors = voxels.color_sum / voxels.count[:, None]
+            pcd.colors = o3d.utility.Vector3dVector(colors if mask is None else colors[mask])
+        # voxel centres land exactly on their own indices in a grid with the same origin
+        high = self.origin + (voxels.keys.max(axis=0) + 1) * size
+        return o3d.geometry.VoxelGrid.create_from_point_cloud_within_bounds(pcd, size, self.origin, high)
+
+    def box_mask(self, level, low, high):
+        """Voxels of a level that overlap the box low-high"""
+        size = self.size(level)
+        first = np.floor((np.asarray(low) - self.origin) / size)
+        last = np.floor((np.asarray(high) - self.origin) / size)
+        keys = self.levels[level].keys
+        return np.all((keys >= first) & (keys <= last), axis=1)
+
+    def box(self, low, high, resolution=None, level=None):
+        """VoxelGrid of the voxels in the box, at the given level or the level for resolution"""
+        if level is None:
+            level = 0 if resolution is None else self.level_for(resolution)
+        return self.grid(level, self.box_mask(level, low, high))
+
+    def info(self):
+        """Per level: voxel size, voxel count and memory of its arrays"""
+        return [{"level": level, "voxel_size": self.size(level), "voxels": len(voxels.keys),
+                 "bytes": sum(a.nbytes for a in voxels if a is not None)}
+                for level, voxels in enumerate(self.levels)]
@@ -0,0 +1,83 @@
+"""Задержка /metrics при тысячах серий: рендер на каждый запрос против кэша.
+
+    python bench_metrics.py --subreddits 2000 --requests 200
+
+2000 сабреддитов дают 26 000 серий. Старый вариант (Flask) вызывал
+generate_latest на каждый запрос; здесь он воспроизводится режимом uncached.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import aiohttp
+from prometheus_client import CollectorRegistry, generate_latest
+
+from collector import RedditCollector, MetricsCache, serve
+
+
+class UncachedMetrics(MetricsCache):
+    """Рендер на каждый запрос, как было с generate_latest во Flask."""
+
+    def get(self):
+        self.version = None
+        return super().get()
+
+
+def synthetic_collector(n, seed=1):
+    rng = random.Random(seed)
+    collector = RedditCollector()
+    collector.publish({f"sub{i:05d}": {
+        "subscribers": rng.randint(1_000, 40_000_000), "active_users": rng.randint(10, 50_000),
+        "posts": 50, "avg_score": rng.random() * 1000, "avg_comments": rng.random() * 200,
+        "total_upvotes": rng.randint(0, 200_000), "total_downvotes": rng.random() * 30_000,
+        "top_post_score": rng.randint(0, 50_000), "top_post_comments": rng.randint(0, 5_000),
+        "title_length_avg": rng.random() * 120, "title_length_max": rng.randint(10, 300),
+        "up": 1, "last_scrape": int(time.time()),
+    } for i in range(n)})
+    return collector
+
+
+async def measure(url, requests, gzip_ok):
+    headers = {"Accept-Encoding": "gzip" if gzip_ok else "identity"}
+    latencies, size = [], 0
+    async with aiohttp.ClientSession(auto_decompress=False) as session:
+        for _ in range(requests):
+            started = time.perf_counter()
+            async with session.get(url, headers=headers) as resp:
+                body = await resp.read()
+            latencies.append((time.perf_counter() - started) * 1000)
+            size = len(body)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], size
+
+
+async def run(subreddits, requests, port):
+    collector = synthetic_collector(subreddits)
+    registry = CollectorRegistry()
+    registry.register(collector)
+
+    started = time.perf_counter()
+    generate_latest(registry)
+    print(f"{subreddits * 13} series, one generate_latest: {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+    print(f"{'mode':<20}{'p50, ms':>10}{'p95, ms':>10}{'bytes':>12}")
+    for name, cache, gzip_ok in (("uncached", UncachedMetrics(registry, collector), False),
+                                 ("cached", MetricsCache(registry, collector), False),
+                                 ("cached + gzip", MetricsCache(registry, collector), True)):
+        runner = await serve("localhost", port, cache)
+        try:
+            p50, p95, size = await measure(f"http://localhost:{port}/metrics", requests, gzip_ok)
+        finally:
+            await runner.cleanup()
+        print(f"{name:<20}{p50:>10.1f}{p95:>10.1f}{size:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /metrics serving")
+    parser.add_argument("--subreddits", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    asyncio.run(run(args.subreddits, args.requests, args.port))
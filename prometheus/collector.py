@@ -0,0 +1,121 @@
+import gzip
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from aiohttp import web
+from prometheus_client import generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# (имя метрики, описание, ключ в статистике сабреддита)
+METRICS = (
+    ('reddit_subscribers', 'Number of subreddit subscribers', 'subscribers'),
+    ('reddit_active_users', 'Number of currently active users', 'active_users'),
+    ('reddit_posts_last_fetch', 'Number of posts fetched last cycle', 'posts'),
+    ('reddit_avg_score', 'Average score for fetched posts', 'avg_score'),
+    ('reddit_avg_comments', 'Average number of comments per post', 'avg_comments'),
+    ('reddit_total_upvotes', 'Total upvotes for fetched posts', 'total_upvotes'),
+    ('reddit_total_downvotes', 'Estimated downvotes (approximation)', 'total_downvotes'),
+    ('reddit_top_post_score', 'Score of top post', 'top_post_score'),
+    ('reddit_top_post_comments', 'Comments on top post', 'top_post_comments'),
+    ('reddit_post_title_length_avg', 'Average title length of posts', 'title_length_avg'),
+    ('reddit_post_title_length_max', 'Max title length among posts', 'title_length_max'),
+    ('reddit_exporter_up', 'Exporter status: 1 = healthy, 0 = error', 'up'),
+    ('reddit_exporter_last_scrape_unix', 'Unix timestamp of last successful scrape', 'last_scrape'),
+)
+
+# Неизменяемый снимок: {сабреддит: {ключ: значение}} на момент конца цикла опроса.
+Snapshot = namedtuple('Snapshot', ['version', 'taken_at', 'subreddits'])
+
+
+def freeze(subreddits, version):
+    """Снимок из обычных словарей; дальше его никто не меняет."""
+    frozen = {sub: MappingProxyType(dict(values)) for sub, values in subreddits.items()}
+    return Snapshot(version, time.time(), MappingProxyType(frozen))
+
+
+class RedditCollector(Collector):
+    """Отдаёт метрики из текущего снимка.
+
+    Скрейпер собирает новый снимок целиком и подменяет ссылку одним
+    присваиванием, поэтому /metrics всегда видит согласованные данные
+    одного цикла, без блокировок и без поштучных Gauge.set().
+    """
+
+    def __init__(self):
+        self.snapshot = freeze({}, 0)
+
+    def publish(self, subreddits):
+        self.snapshot = freeze(subreddits, self.snapshot.version + 1)
+
+    def collect(self):
+        snapshot = self.snapshot  # одно чтение ссылки на весь проход
+        for name, documentation, key in METRICS:
+            family = GaugeMetricFamily(name, documentation, labels=['subreddit'])
+            for sub, values in snapshot.subreddits.items():
+                if key in values:
+                    family.add_metric([sub], values[key])
+            yield family
+
+
+class MetricsCache:
+    """Готовый текст /metrics (и его gzip) для одной версии снимка.
+
+    Рендер делается один раз после появления нового снимка, все
+    последующие запросы Prometheus получают уже готовые байты.
+    """
+
+    def __init__(self, registry, collector, compresslevel=6):
+        self.registry = registry
+        self.collector = collector
+        self.compresslevel = compresslevel
+        self.version = None
+        self.plain = self.gzipped = b""
+
+    def get(self):
+        version = self.collector.snapshot.version
+        if version != self.version:
+            self.plain = generate_latest(self.registry)
+            self.gzipped = gzip.compress(self.plain, compresslevel=self.compresslevel)
+            self.version = version
+        return self.plain, self.gzipped
+
+
+class TimedCache(MetricsCache):
+    """Для многопроцессного режима: версии снимка нет, текст живёт max_age секунд."""
+
+    def __init__(self, registry, max_age=1.0, compresslevel=6):
+        super().__init__(registry, None, compresslevel)
+        self.max_age = max_age
+        self.rendered_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if now - self.rendered_at >= self.max_age:
+            self.plain = generate_latest(self.registry)
+            self.gzipped = gzip.compress(self.plain, compresslevel=self.compresslevel)
+            self.rendered_at = now
+        return self.plain, self.gzipped
+
+
+def make_app(cache):
+    async def metrics(request):
+        """Эндпоинт для Prometheus: готовые байты из кэша, gzip если клиент его принимает."""
+        plain, gzipped = cache.get()
+        headers = {"Content-Type": "text/plain; version=0.0.4; charset=utf-8", "Vary": "Accept-Encoding"}
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return web.Response(body=gzipped, headers=headers)
+        return web.Response(body=plain, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+async def serve(host, port, cache):
+    runner = web.AppRunner(make_app(cache), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
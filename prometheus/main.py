@@ -1,97 +1,102 @@
-# pip install requests flask prometheus-client
-import time
-import requests
-from threading import Thread
-from flask import Flask, Response
-from prometheus_client import Gauge, generate_latest, REGISTRY
-
-# === Настройки ===
-SUBREDDITS = ["technology", "worldnews", "python", "gaming"]  # можно добавить любые
-POLL_INTERVAL = 10  # интервал опроса в секундах
-
-# === Метрики Reddit ===
-reddit_subscribers = Gauge('reddit_subscribers', 'Number of subreddit subscribers', ['subreddit'])
-reddit_active_users = Gauge('reddit_active_users', 'Number of currently active users', ['subreddit'])
-reddit_posts_last = Gauge('reddit_posts_last_fetch', 'Number of posts fetched last cycle', ['subreddit'])
-reddit_avg_score = Gauge('reddit_avg_score', 'Average score for fetched posts', ['subreddit'])
-reddit_avg_comments = Gauge('reddit_avg_comments', 'Average number of comments per post', ['subreddit'])
-reddit_total_upvotes = Gauge('reddit_total_upvotes', 'Total upvotes for fetched posts', ['subreddit'])
-reddit_total_downvotes = Gauge('reddit_total_downvotes', 'Estimated downvotes (approximation)', ['subreddit'])
-reddit_top_post_score = Gauge('reddit_top_post_score', 'Score of top post', ['subreddit'])
-reddit_top_post_comments = Gauge('reddit_top_post_comments', 'Comments on top post', ['subreddit'])
-reddit_post_title_length_avg = Gauge('reddit_post_title_length_avg', 'Average title length of posts', ['subreddit'])
-reddit_post_title_length_max = Gauge('reddit_post_title_length_max', 'Max title length among posts', ['subreddit'])
-reddit_exporter_up = Gauge('reddit_exporter_up', 'Exporter status: 1 = healthy, 0 = error', ['subreddit'])
-reddit_exporter_last_scrape = Gauge('reddit_exporter_last_scrape_unix', 'Unix timestamp of last successful scrape', ['subreddit'])
-
-app = Flask(__name__)
-
-def fetch_reddit_data(subreddit):
-    """Получает данные о сабреддите и его последних постах."""
-    base = f"https://www.reddit.com/r/{subreddit}/"
-    headers = {"User-Agent": "PrometheusRedditExporter/1.0"}
-    info = requests.get(base + "about.json", headers=headers, timeout=5)
-    posts = requests.get(base + "new.json?limit=50", headers=headers, timeout=5)
-    info.raise_for_status()
-    posts.raise_for_status()
-    return info.json(), posts.json()
-
-def scrape_loop():
-    while True:
-        for sub in SUBREDDITS:
-            try:
-                info, posts = fetch_reddit_data(sub)
-                data = info.get("data", {})
-                posts_data = posts.get("data", {}).get("children", [])
-
-                subs = data.get("subscribers", 0)
-                active = data.get("active_user_count", 0)
-                reddit_subscribers.labels(subreddit=sub).set(subs)
-                reddit_active_users.labels(subreddit=sub).set(active)
-
-                if posts_data:
-                    scores = [p["data"].get("score", 0) for p in posts_data]
-                    comments = [p["data"].get("num_comments", 0) for p in posts_data]
-                    titles = [p["data"].get("title", "") for p in posts_data]
-
-                    avg_score = sum(scores) / len(scores)
-                    avg_comments = sum(comments) / len(comments)
-                    total_upvotes = sum(scores)
-                    estimated_downvotes = total_upvotes * 0.15
-                    top_post = max(posts_data, key=lambda x: x["data"].get("score", 0))["data"]
-                    top_score = top_post.get("score", 0)
-                    top_comments = top_post.get("num_comments", 0)
-                    avg_title_len = sum(len(t) for t in titles) / len(titles)
-                    max_title_len = max(len(t) for t in titles)
-
-                    reddit_posts_last.labels(subreddit=sub).set(len(posts_data))
-                    reddit_avg_score.labels(subreddit=sub).set(avg_score)
-                    reddit_avg_comments.labels(subreddit=sub).set(avg_comments)
-                    reddit_total_upvotes.labels(subreddit=sub).set(total_upvotes)
-                    reddit_total_downvotes.labels(subreddit=sub).set(estimated_downvotes)
-                    reddit_top_post_score.labels(subreddit=sub).set(top_score)
-                    reddit_top_post_comments.labels(subreddit=sub).set(top_comments)
-                    reddit_post_title_length_avg.labels(subreddit=sub).set(avg_title_len)
-                    reddit_post_title_length_max.labels(subreddit=sub).set(max_title_len)
-
-                reddit_exporter_up.labels(subreddit=sub).set(1)
-                reddit_exporter_last_scrape.labels(subreddit=sub).set(int(time.time()))
-
-                print(f"[OK] {time.strftime('%H:%M:%S')} r/{sub}: {len(posts_data)} posts, {subs} subs")
-            except Exception as e:
-                print(f"[ERROR] {time.strftime('%H:%M:%S')} {sub}: {e}")
-                reddit_exporter_up.labels(subreddit=sub).set(0)
-            time.sleep(1)  # небольшая пауза между сабами
-
-        time.sleep(POLL_INTERVAL)
-
-@app.route('/metrics')
-def metrics():
-    """Эндпоинт для Prometheus."""
-    return Response(generate_latest(REGISTRY), mimetype='text/plain; version=0.0.4; charset=utf-8')
-
-if __name__ == '__main__':
-    print(f"Starting Reddit exporter for subreddits: {', '.join(SUBREDDITS)}")
-    t = Thread(target=scrape_loop, daemon=True)
-    t.start()
-    app.run(host='localhost', port=8000)
+# pip install aiohttp prometheus-client
+import asyncio
+import os
+import time
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, ProcessCollector
+from collector import RedditCollector, MetricsCache, serve
+from posts import SubredditState
+from shards import load_config
+from scraper import RedditScraper
+
+# === Настройки ===
+SUBREDDITS_FILE = os.getenv("SUBREDDITS_FILE", "subreddits.json")  # список сабреддитов и число шардов
+SUBREDDITS = ["technology", "worldnews", "python", "gaming"]  # если файла нет
+if os.path.exists(SUBREDDITS_FILE):
+    SUBREDDITS = load_config(SUBREDDITS_FILE)[1]
+POLL_INTERVAL = 10  # интервал опроса в секундах (растягивается, если лимит запросов не успевает)
+REQUESTS_PER_SUBREDDIT = 3  # запросов на сабреддит в худшем обычном цикле: about, new?before и проверка курсора
+REDDIT_BASE_URL = os.getenv("REDDIT_BASE_URL", "https://www.reddit.com")  # для тестов: адрес stub_reddit.py
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "16"))  # одновременных HTTP-запросов
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "10"))  # запросов в секунду на один хост
+POSTS_WINDOW = int(os.getenv("POSTS_WINDOW", "50"))  # последних постов в статистике сабреддита
+ABOUT_INTERVAL = float(os.getenv("ABOUT_INTERVAL", "60"))  # как часто обновлять about.json, сек
+RESYNC_INTERVAL = float(os.getenv("RESYNC_INTERVAL", "600"))  # полное перечитывание окна постов, сек
+METRICS_HOST = os.getenv("METRICS_HOST", "localhost")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+
+# === Метрики Reddit ===
+# Значения по сабреддитам живут в неизменяемом снимке (collector.py), а не в 13 отдельных Gauge.
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)  # как и остальное, обновляется в /metrics раз в цикл опроса
+collector = RedditCollector()
+REGISTRY.register(collector)
+metrics_cache = MetricsCache(REGISTRY, collector)
+
+# === Метрики самого экспортера ===
+SCRAPE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+reddit_scrape_duration = Histogram('reddit_scrape_duration_seconds', 'Time to fetch one subreddit (about + new)', buckets=SCRAPE_BUCKETS, registry=REGISTRY)
+reddit_scrape_cycle_duration = Histogram('reddit_scrape_cycle_duration_seconds', 'Time to fetch all subreddits in one cycle', buckets=SCRAPE_BUCKETS, registry=REGISTRY)
+reddit_scrape_bytes = Counter('reddit_scrape_response_bytes', 'Bytes of Reddit API responses received', registry=REGISTRY)
+reddit_new_posts = Counter('reddit_new_posts', 'Posts received from new.json', registry=REGISTRY)
+reddit_scrape_interval = Gauge('reddit_scrape_interval_seconds', 'Effective poll interval (POLL_INTERVAL stretched to fit the rate limit)',
+                               registry=REGISTRY, multiprocess_mode='max')
+reddit_scrape_lag = Gauge('reddit_scrape_lag_seconds', 'How far the last cycle ran past the poll interval',
+                          registry=REGISTRY, multiprocess_mode='max')
+
+def cycle_interval(subreddits, poll_interval=POLL_INTERVAL, rate=RATE_LIMIT_RPS):
+    """Интервал цикла: POLL_INTERVAL, но не меньше времени, которое лимит запросов даёт на цикл."""
+    return max(poll_interval, subreddits * REQUESTS_PER_SUBREDDIT / rate)
+
+async def scrape_forever(subreddits=SUBREDDITS, publish=collector.publish):
+    """Все сабреддиты опрашиваются параллельно, цикл стартует раз в POLL_INTERVAL.
+
+    За цикл приходят только новые посты (курсор before), about.json — раз в
+    ABOUT_INTERVAL. В конце цикла publish() получает значения всех сабреддитов:
+    здесь это новый снимок коллектора, в шардированном режиме — Gauge воркера.
+    """
+    states = {sub: SubredditState(sub, POSTS_WINDOW, ABOUT_INTERVAL, RESYNC_INTERVAL) for sub in subreddits}
+    # цикл не может быть короче, чем позволяет лимит запросов: иначе он отставал бы каждый раз
+    interval = cycle_interval(len(subreddits))
+    reddit_scrape_interval.set(interval)
+    if interval > POLL_INTERVAL:
+        print(f"[INFO] {len(subreddits)} subreddits at {RATE_LIMIT_RPS:g} req/s: polling every {interval:.0f}s "
+              f"instead of POLL_INTERVAL={POLL_INTERVAL}s; raise RATE_LIMIT_RPS or split them with sharded.py")
+    current = {}
+    async with RedditScraper(REDDIT_BASE_URL, concurrency=SCRAPE_CONCURRENCY, rate=RATE_LIMIT_RPS) as scraper:
+        while True:
+            started = time.monotonic()
+            received = scraper.bytes_received
+            results = await scraper.run_all({sub: state.refresh(scraper) for sub, state in states.items()})
+            previous, current = current, {}
+            new_posts = 0
+            for sub, (result, seconds) in results.items():
+                reddit_scrape_duration.observe(seconds)
+                if isinstance(result, Exception):
+                    print(f"[ERROR] {time.strftime('%H:%M:%S')} {sub}: {result}")
+                    current[sub] = {**previous.get(sub, {}), "up": 0}
+                    continue
+                new_posts += result
+                current[sub] = {**states[sub].stats(), "up": 1, "last_scrape": int(time.time())}
+                print(f"[OK] {time.strftime('%H:%M:%S')} r/{sub}: {result} new posts, "
+                      f"{current[sub]['subscribers']} subs")
+            cycle = time.monotonic() - started
+            received = scraper.bytes_received - received
+            reddit_scrape_cycle_duration.observe(cycle)
+            reddit_scrape_bytes.inc(received)
+            reddit_new_posts.inc(new_posts)
+            reddit_scrape_lag.set(max(0.0, cycle - interval))
+            publish(current)  # после гистограмм: кэш /metrics сбрасывается по версии снимка
+            print(f"[CYCLE] {len(subreddits)} subreddits in {cycle:.2f}s, {new_posts} new posts, {received / 1024:.1f} KB")
+            await asyncio.sleep(max(0.0, interval - cycle))
+
+async def run():
+    runner = await serve(METRICS_HOST, METRICS_PORT, metrics_cache)
+    print(f"Metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    try:
+        await scrape_forever()
+    finally:
+        await runner.cleanup()
+
+if __name__ == '__main__':
+    print(f"Starting Reddit exporter for subreddits: {', '.join(SUBREDDITS)}")
+    asyncio.run(run())
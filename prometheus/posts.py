@@ -0,0 +1,160 @@
+import time
+from collections import deque
+
+
+class PostWindow:
+    """Последние `size` постов сабреддита со скользящими суммами и максимумами.
+
+    Хранятся только числа, нужные метрикам. Суммы обновляются при
+    добавлении и вытеснении поста, максимумы держатся в монотонных
+    очередях, так что новый пост обходится в O(1) амортизированно.
+    """
+
+    def __init__(self, size=50):
+        self.size = size
+        self.posts = deque()  # (seq, name, score, comments, title_len), старые слева
+        self.seq = 0
+        self.score_sum = self.comments_sum = self.title_sum = 0
+        self.top = deque()  # кандидаты в топ-пост, score по убыванию
+        self.longest = deque()  # кандидаты в самый длинный заголовок
+
+    def __len__(self):
+        return len(self.posts)
+
+    @property
+    def newest(self):
+        return self.posts[-1][1] if self.posts else None
+
+    def clear(self):
+        self.posts.clear()
+        self.top.clear()
+        self.longest.clear()
+        self.score_sum = self.comments_sum = self.title_sum = 0
+
+    def add(self, post):
+        """Добавляет пост (data из листинга); посты передаются от старых к новым."""
+        entry = (self.seq, post.get("name"), post.get("score", 0), post.get("num_comments", 0),
+                 len(post.get("title", "")))
+        self.seq += 1
+        self.posts.append(entry)
+        self.score_sum += entry[2]
+        self.comments_sum += entry[3]
+        self.title_sum += entry[4]
+        # при равенстве остаётся более новый пост, как max() по листингу new.json
+        while self.top and self.top[-1][2] <= entry[2]:
+            self.top.pop()
+        self.top.append(entry)
+        while self.longest and self.longest[-1][4] <= entry[4]:
+            self.longest.pop()
+        self.longest.append(entry)
+        if len(self.posts) > self.size:
+            self._evict()
+
+    def _evict(self):
+        old = self.posts.popleft()
+        self.score_sum -= old[2]
+        self.comments_sum -= old[3]
+        self.title_sum -= old[4]
+        if self.top[0][0] == old[0]:
+            self.top.popleft()
+        if self.longest[0][0] == old[0]:
+            self.longest.popleft()
+
+    def stats(self):
+        """Значения метрик по постам окна (пусто, если постов ещё нет)."""
+        n = len(self.posts)
+        if not n:
+            return {}
+        top = self.top[0]
+        return {
+            "avg_score": self.score_sum / n,
+            "avg_comments": self.comments_sum / n,
+            "total_upvotes": self.score_sum,
+            "total_downvotes": self.score_sum * 0.15,
+            "top_post_score": top[2],
+            "top_post_comments": top[3],
+            "title_length_avg": self.title_sum / n,
+            "title_length_max": self.longest[0][4],
+        }
+
+
+class SubredditState:
+    """Что экспортер помнит о сабреддите между циклами.
+
+    new.json запрашивается с курсором `before` = самый новый виденный пост,
+    поэтому приходят только новые посты. Счёт и комментарии старых постов
+    со временем меняются, поэтому раз в resync_interval окно перечитывается
+    целиком. Удалённый пост-курсор делает выдачу пустой навсегда, а по
+    ответу его не отличить от затишья, поэтому после пустой выдачи самый
+    новый пост сабреддита (limit=1) сверяется с курсором; окно перечитывается
+    только если они разошлись. about.json обновляется реже, раз в
+    about_interval.
+    """
+
+    def __init__(self, name, window=50, about_interval=60, resync_interval=600, page_limit=100):
+        self.name = name
+        self.window = PostWindow(window)
+        self.about_interval = about_interval
+        self.resync_interval = resync_interval
+        self.page_limit = page_limit
+        self.about = {}
+        self.about_at = self.synced_at = None
+        self.new_posts = 0
+
+    async def refresh(self, scraper, now=None):
+        """Один цикл опроса; возвращает число полученных постов."""
+        now = time.monotonic() if now is None else now
+        if self.about_at is None or now - self.about_at >= self.about_interval:
+            info = await scraper.fetch_about(self.name)
+            self.about = info.get("data", {})
+            self.about_at = now
+
+        posts = None
+        if self.synced_at is not None and now - self.synced_at < self.resync_interval and self.window.newest:
+            posts = await self._fetch_newer(scraper)
+            for post in reversed(posts or []):
+                self.window.add(post)
+            if posts == [] and not await self._cursor_alive(scraper):
+                posts = None  # курсор пропал: перечитываем окно сейчас
+        if posts is None:
+            posts = await scraper.fetch_new(self.name, limit=self.window.size)
+            self.window.clear()
+            for post in reversed(posts):
+                self.window.add(post)
+            self.synced_at = now
+        self.new_posts = len(posts)
+        return self.new_posts
+
+    async def _cursor_alive(self, scraper):
+        """Самый новый пост сабреддита всё ещё совпадает с курсором.
+
+        Если пост появился между двумя запросами, проверка тоже не пройдёт,
+        и окно просто перечитается раньше срока.
+        """
+        latest = await scraper.fetch_new(self.name, limit=1)
+        return bool(latest) and latest[0].get("name") == self.window.newest
+
+    async def _fetch_newer(self, scraper):
+        """Посты новее курсора, от новых к старым.
+
+        Reddit отдаёт ближайшую к курсору страницу, дальше листаем к новым.
+        None, если новых постов больше, чем помещается в окно: тогда проще
+        перечитать последние посты целиком.
+        """
+        newer, anchor = [], self.window.newest
+        for _ in range(-(-self.window.size // self.page_limit)):
+            page = await scraper.fetch_new(self.name, limit=self.page_limit, before=anchor)
+            newer = page + newer
+            if len(page) < self.page_limit:
+                return newer
+            anchor = page[0]["name"]
+        return None
+
+    def stats(self):
+        stats = {
+            "subscribers": self.about.get("subscribers", 0),
+            "active_users": self.about.get("active_user_count", 0),
+            "posts": self.new_posts,
+        }
+        stats.update(self.window.stats())
+        return stats
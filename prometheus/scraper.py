@@ -0,0 +1,97 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+
+class RateLimiter:
+    """Token bucket: не больше `rate` запросов в секунду, всплески до `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:  # ожидающие обслуживаются по очереди
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RedditScraper:
+    """Параллельный сбор about.json и new.json для многих сабреддитов.
+
+    Одна aiohttp-сессия с пулом keep-alive соединений на весь процесс,
+    общий лимит одновременных запросов и отдельный rate limit на каждый хост.
+    base_url можно направить на локальный стаб (см. stub_reddit.py).
+    """
+
+    def __init__(self, base_url="https://www.reddit.com", concurrency=16, rate=10.0, burst=None,
+                 timeout=5.0, posts_limit=50, user_agent="PrometheusRedditExporter/1.0"):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.timeout = timeout
+        self.posts_limit = posts_limit
+        self.headers = {"User-Agent": user_agent}
+        self.limiters = {}
+        self.session = None
+        self.bytes_received = 0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    def _limiter(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.limiters:
+            self.limiters[host] = RateLimiter(self.rate, self.burst)
+        return self.limiters[host]
+
+    async def get_json(self, url, params=None):
+        await self._limiter(url).acquire()
+        async with self.session.get(url, params=params) as resp:
+            resp.raise_for_status()
+            body = await resp.read()
+        self.bytes_received += len(body)
+        return json.loads(body)
+
+    async def fetch_about(self, subreddit):
+        return await self.get_json(f"{self.base_url}/r/{subreddit}/about.json")
+
+    async def fetch_new(self, subreddit, limit=None, before=None):
+        """Посты из new.json (data каждого), от новых к старым; before — курсор Reddit."""
+        params = {"limit": limit or self.posts_limit}
+        if before:
+            params["before"] = before
+        listing = await self.get_json(f"{self.base_url}/r/{subreddit}/new.json", params=params)
+        return [child["data"] for child in listing.get("data", {}).get("children", [])]
+
+    async def _timed(self, coro):
+        started = time.monotonic()
+        try:
+            result = await coro
+        except Exception as e:
+            result = e
+        return result, time.monotonic() - started
+
+    async def run_all(self, coros):
+        """{ключ: корутина} -> {ключ: (результат или исключение, секунды)}, всё параллельно."""
+        results = await asyncio.gather(*(self._timed(coro) for coro in coros.values()))
+        return dict(zip(coros, results))
@@ -0,0 +1,170 @@
+"""Шардированный экспортер: N процессов-воркеров и один общий /metrics.
+
+Сабреддиты и число шардов берутся из subreddits.json и раскладываются по
+шардам консистентным хешированием (shards.py). Каждый воркер — обычный
+цикл опроса из main.py, метрики он пишет через multiprocess-режим
+prometheus_client, а этот процесс собирает их в один /metrics. Файл
+конфигурации перечитывается на ходу: воркеры, у которых поменялся список,
+перезапускаются, остальные продолжают работать.
+
+    cd prometheus
+    python sharded.py
+"""
+import os
+import shutil
+import tempfile
+
+# до импорта prometheus_client: в этом режиме значения метрик живут в mmap-файлах
+MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                                      os.path.join(tempfile.gettempdir(), "reddit_exporter_metrics"))
+
+import asyncio
+import multiprocessing as mp
+import time
+from prometheus_client import CollectorRegistry, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from collector import METRICS, TimedCache, serve
+from shards import assign, load_config
+
+SUBREDDITS_FILE = os.getenv("SUBREDDITS_FILE", "subreddits.json")
+METRICS_HOST = os.getenv("METRICS_HOST", "localhost")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+CONFIG_CHECK_INTERVAL = 5  # как часто проверять файл конфигурации и живость воркеров, сек
+
+
+def worker(shard, subreddits, heartbeat):
+    """Процесс шарда: опрашивает свои сабреддиты, пишет метрики в общий каталог."""
+    import main
+    from prometheus_client import Gauge
+
+    # livesum: у сабреддита один владелец, а файлы остановленного воркера удаляются
+    gauges = {key: Gauge(name, doc, ['subreddit'], multiprocess_mode='livesum') for name, doc, key in METRICS}
+
+    def publish(current):
+        for sub, values in current.items():
+            for key, gauge in gauges.items():
+                if key in values:
+                    gauge.labels(subreddit=sub).set(values[key])
+        heartbeat.value = time.time()
+
+    print(f"[SHARD {shard}] pid {os.getpid()}: {', '.join(subreddits)}")
+    asyncio.run(main.scrape_forever(subreddits, publish))
+
+
+class Shard:
+    def __init__(self, process, subreddits, heartbeat, restarts):
+        self.process = process
+        self.subreddits = subreddits
+        self.heartbeat = heartbeat  # время конца последнего цикла (unix), пишет воркер
+        self.started_at = time.time()
+        self.restarts = restarts
+
+
+class Supervisor(Collector):
+    """Запускает воркеры по плану шардов и отдаёт метрики о самих шардах."""
+
+    def __init__(self, config_path):
+        self.config_path = config_path
+        self.config_mtime = None
+        self.ctx = mp.get_context("spawn")
+        self.shards = {}
+
+    def start(self, shard, subreddits, restarts=0):
+        heartbeat = self.ctx.Value('d', 0.0)
+        process = self.ctx.Process(target=worker, args=(shard, subreddits, heartbeat), daemon=True)
+        process.start()
+        self.shards[shard] = Shard(process, subreddits, heartbeat, restarts)
+
+    async def stop(self, shard):
+        process = self.shards.pop(shard).process
+        process.terminate()
+        # join блокирует до 5 с — ждём в пуле потоков, чтобы /metrics продолжал отвечать
+        await asyncio.get_running_loop().run_in_executor(None, process.join, 5)
+        multiprocess.mark_process_dead(process.pid)
+
+    async def apply(self, plan):
+        """Перезапускает только те шарды, чей список сабреддитов изменился."""
+        for shard in sorted(set(self.shards) | set(plan)):
+            subreddits = plan.get(shard, [])
+            running = self.shards.get(shard)
+            if running and running.subreddits == subreddits:
+                continue
+            restarts = 0
+            if running:
+                restarts = running.restarts + 1
+                await self.stop(shard)
+            if subreddits:
+                self.start(shard, subreddits, restarts)
+                print(f"[REBALANCE] shard {shard}: {len(subreddits)} subreddits")
+
+    def read_plan(self):
+        """Новый план шардов, если файл конфигурации изменился; иначе None.
+
+        Битый, недописанный или удалённый файл не трогает текущий план:
+        ошибка пишется в лог, а mtime запоминается только после удачного
+        разбора, так что файл перечитается на следующей проверке.
+        """
+        try:
+            mtime = os.path.getmtime(self.config_path)
+            if mtime == self.config_mtime:
+                return None
+            shards, subreddits = load_config(self.config_path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"[ERROR] {self.config_path}: {type(e).__name__}: {e}, keeping the current plan")
+            return None
+        self.config_mtime = mtime
+        return assign(subreddits, shards)
+
+    async def check(self):
+        plan = self.read_plan()
+        if plan is not None:
+            await self.apply(plan)
+        for shard, running in list(self.shards.items()):
+            if not running.process.is_alive():
+                print(f"[ERROR] shard {shard} exited with {running.process.exitcode}, restarting")
+                multiprocess.mark_process_dead(running.process.pid)
+                self.start(shard, running.subreddits, running.restarts + 1)
+
+    async def stop_all(self):
+        for shard in list(self.shards):
+            await self.stop(shard)
+
+    def collect(self):
+        now = time.time()
+        lag = GaugeMetricFamily('reddit_shard_lag_seconds',
+                                'Seconds since the shard last finished a scrape cycle', labels=['shard'])
+        assigned = GaugeMetricFamily('reddit_shard_subreddits', 'Subreddits assigned to the shard', labels=['shard'])
+        restarts = CounterMetricFamily('reddit_shard_restarts', 'Worker restarts (crash or rebalance)', labels=['shard'])
+        for shard, running in sorted(self.shards.items()):
+            label = [str(shard)]
+            lag.add_metric(label, now - (running.heartbeat.value or running.started_at))
+            assigned.add_metric(label, len(running.subreddits))
+            restarts.add_metric(label, running.restarts)
+        yield lag
+        yield assigned
+        yield restarts
+
+
+async def run():
+    # файлы прошлого запуска дали бы метрики давно остановленных процессов
+    shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(MULTIPROC_DIR)
+
+    supervisor = Supervisor(SUBREDDITS_FILE)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(supervisor)
+    runner = await serve(METRICS_HOST, METRICS_PORT, TimedCache(registry))
+    print(f"Metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    try:
+        while True:
+            await supervisor.check()
+            await asyncio.sleep(CONFIG_CHECK_INTERVAL)
+    finally:
+        await supervisor.stop_all()
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,46 @@
+import bisect
+import hashlib
+import json
+
+# Список сабреддитов и число шардов, например:
+# {"shards": 4, "subreddits": ["technology", "worldnews", "python", "gaming"]}
+DEFAULT_CONFIG = "subreddits.json"
+
+
+def load_config(path=DEFAULT_CONFIG):
+    """(число шардов, список сабреддитов без повторов) из JSON-файла."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    subreddits = list(dict.fromkeys(s.strip() for s in config["subreddits"] if s.strip()))
+    return max(1, int(config.get("shards", 1))), subreddits
+
+
+def _point(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Консистентное хеширование: у каждого шарда `vnodes` точек на кольце.
+
+    При добавлении или удалении сабреддита двигается только он сам, при
+    смене числа шардов переезжает примерно 1/N сабреддитов.
+    """
+
+    def __init__(self, shards, vnodes=160):
+        self.shards = shards
+        ring = sorted((_point(f"shard-{shard}#{v}"), shard) for shard in range(shards) for v in range(vnodes))
+        self.points = [p for p, _ in ring]
+        self.owners = [s for _, s in ring]
+
+    def shard_for(self, subreddit):
+        i = bisect.bisect(self.points, _point(subreddit.lower())) % len(self.points)
+        return self.owners[i]
+
+
+def assign(subreddits, shards):
+    """{шард: [сабреддиты]} для всех шардов, включая пустые."""
+    ring = HashRing(shards)
+    plan = {shard: [] for shard in range(shards)}
+    for sub in subreddits:
+        plan[ring.shard_for(sub)].append(sub)
+    return plan
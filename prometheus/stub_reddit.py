@@ -0,0 +1,123 @@
+"""Локальный стаб Reddit API для тестов экспортера.
+
+Отдаёт /r/<sub>/about.json и /r/<sub>/new.json (limit, before) с синтетическими
+постами, которые появляются со временем. Запуск:
+
+    python stub_reddit.py --port 8081 --latency 0.2 --posts-per-minute 30
+    REDDIT_BASE_URL=http://localhost:8081 python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class FakeReddit:
+    def __init__(self, posts_per_minute=30.0, seed=1):
+        self.posts_per_minute = posts_per_minute
+        self.seed = seed
+        self.started = time.time()
+        self.posts = {}  # sub -> список постов, новые в конце
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def _sub_rng(self, sub, salt=0):
+        return random.Random(zlib.crc32(sub.encode()) + self.seed + salt)
+
+    def _catch_up(self, sub):
+        posts = self.posts.setdefault(sub, [])
+        due = 50 + int((time.time() - self.started) * self.posts_per_minute / 60)
+        while len(posts) < due:
+            n = len(posts)
+            rng = self._sub_rng(sub, n)
+            posts.append({
+                "name": f"t3_{sub[:3]}{n:07d}",
+                "title": "Post " + "x" * rng.randint(10, 120),
+                "score": rng.randint(0, 5000),
+                "num_comments": rng.randint(0, 800),
+                "created_utc": self.started + n,
+            })
+        return posts
+
+    def about(self, sub):
+        rng = self._sub_rng(sub)
+        return {"kind": "t5", "data": {
+            "display_name": sub,
+            "subscribers": rng.randint(10_000, 40_000_000),
+            "active_user_count": random.randint(100, 50_000),
+        }}
+
+    def new(self, sub, limit=25, before=None):
+        with self.lock:
+            posts = self._catch_up(sub)
+            newest_first = posts[::-1]
+            if before:
+                # как у Reddit: страница сразу перед `before`, т.е. самые старые из более новых
+                names = [p["name"] for p in newest_first]
+                newer = newest_first[:names.index(before)] if before in names else []
+                page = newer[-limit:]
+            else:
+                page = newest_first[:limit]
+        return {"kind": "Listing", "data": {
+            "children": [{"kind": "t3", "data": p} for p in page],
+            "before": page[0]["name"] if page else None,
+        }}
+
+
+def make_handler(fake, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, как у настоящего API
+
+        def do_GET(self):
+            fake.requests += 1
+            url = urlsplit(self.path)
+            parts = url.path.strip("/").split("/")
+            query = parse_qs(url.query)
+            if latency:
+                time.sleep(latency)
+            if len(parts) == 3 and parts[0] == "r" and parts[2] == "about.json":
+                body = fake.about(parts[1])
+            elif len(parts) == 3 and parts[0] == "r" and parts[2] == "new.json":
+                limit = int(query.get("limit", ["25"])[0])
+                body = fake.new(parts[1], limit, query.get("before", [None])[0])
+            else:
+                self.send_error(404)
+                return
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8081, latency=0.0, posts_per_minute=30.0):
+    """Запускает стаб в фоновом потоке, возвращает (server, fake)."""
+    fake = FakeReddit(posts_per_minute)
+    server = ThreadingHTTPServer(("localhost", port), make_handler(fake, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Reddit API for exporter tests")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, сек")
+    parser.add_argument("--posts-per-minute", type=float, default=30.0)
+    args = parser.parse_args()
+    server, _ = serve(args.port, args.latency, args.posts_per_minute)
+    print(f"Fake Reddit on http://localhost:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
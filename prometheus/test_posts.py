@@ -0,0 +1,151 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import stub_reddit
+from posts import SubredditState
+
+SUB = "python"
+
+
+class StubScraper:
+    """fetch_about/fetch_new как у RedditScraper, но прямо поверх FakeReddit, без HTTP"""
+
+    def __init__(self, fake):
+        self.fake = fake
+        self.calls = []  # (limit, before) каждого запроса new.json
+
+    async def fetch_about(self, subreddit):
+        return self.fake.about(subreddit)
+
+    async def fetch_new(self, subreddit, limit=None, before=None):
+        self.calls.append((limit, before))
+        listing = self.fake.new(subreddit, limit or 25, before)
+        return [child["data"] for child in listing["data"]["children"]]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Часы стаба: при 60 постах в минуту +1 секунда = +1 пост"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(stub_reddit, "time", SimpleNamespace(time=lambda: now[0], sleep=time.sleep))
+    return now
+
+
+@pytest.fixture
+def scraper(clock):
+    return StubScraper(stub_reddit.FakeReddit(posts_per_minute=60))
+
+
+def newest(fake, n):
+    """Имена n самых новых постов стаба, от новых к старым"""
+    return [p["name"] for p in fake.posts[SUB][::-1][:n]]
+
+
+def window_names(state):
+    return [entry[1] for entry in reversed(state.window.posts)]
+
+
+def test_new_posts_are_paged_from_the_cursor(scraper, clock):
+    state = SubredditState(SUB, window=20, page_limit=5)
+    assert asyncio.run(state.refresh(scraper, now=0)) == 20
+    cursor = state.window.newest
+    assert scraper.calls == [(20, None)]
+
+    clock[0] += 12
+    scraper.calls.clear()
+    assert asyncio.run(state.refresh(scraper, now=10)) == 12
+
+    names = newest(scraper.fake, 20)
+    # три страницы по курсору: 5 + 5 + 2 поста, последняя неполная
+    assert scraper.calls == [(5, cursor), (5, names[7]), (5, names[2])]
+    assert window_names(state) == names
+    full = SubredditState(SUB, window=20)
+    asyncio.run(full.refresh(scraper, now=10))
+    assert state.stats()["avg_score"] == pytest.approx(full.stats()["avg_score"])
+    assert state.stats()["top_post_score"] == full.stats()["top_post_score"]
+
+
+def test_more_new_posts_than_the_window_reread_it(scraper, clock):
+    state = SubredditState(SUB, window=10, page_limit=5)
+    asyncio.run(state.refresh(scraper, now=0))
+
+    clock[0] += 30
+    scraper.calls.clear()
+    asyncio.run(state.refresh(scraper, now=10))
+
+    assert scraper.calls[-1] == (10, None)
+    assert window_names(state) == newest(scraper.fake, 10)
+
+
+def test_empty_delta_keeps_the_cursor(scraper):
+    state = SubredditState(SUB, window=20, page_limit=5)
+    asyncio.run(state.refresh(scraper, now=0))
+    cursor, stats = state.window.newest, state.stats()
+
+    scraper.calls.clear()
+    assert asyncio.run(state.refresh(scraper, now=10)) == 0
+
+    # пустая страница и одна проверка limit=1, без перечитывания окна
+    assert scraper.calls == [(5, cursor), (1, None)]
+    assert state.window.newest == cursor
+    assert state.synced_at == 0
+    assert state.stats() == {**stats, "posts": 0}
+
+
+def test_deleted_cursor_rereads_the_window(scraper):
+    state = SubredditState(SUB, window=20, page_limit=5)
+    asyncio.run(state.refresh(scraper, now=0))
+    cursor = state.window.newest
+    # стаб догенерирует пост по счётчику, поэтому удаление = пост-курсор сменил имя
+    scraper.fake.posts[SUB][-1]["name"] += "x"
+
+    scraper.calls.clear()
+    assert asyncio.run(state.refresh(scraper, now=10)) == 20
+
+    assert scraper.calls == [(5, cursor), (1, None), (20, None)]
+    assert window_names(state) == newest(scraper.fake, 20)
+    assert state.synced_at == 10
+
+
+def test_resync_picks_up_changed_scores(scraper):
+    state = SubredditState(SUB, window=20, page_limit=5, resync_interval=600)
+    asyncio.run(state.refresh(scraper, now=0))
+    scraper.fake.posts[SUB][-5]["score"] = 1_000_000
+
+    asyncio.run(state.refresh(scraper, now=300))
+    assert state.stats()["top_post_score"] < 1_000_000  # между ресинками старые посты не перечитываются
+
+    scraper.calls.clear()
+    asyncio.run(state.refresh(scraper, now=600))
+    assert scraper.calls == [(20, None)]
+    assert state.stats()["top_post_score"] == 1_000_000
+    assert state.synced_at == 600
+
+
+def test_refresh_over_http(clock):
+    """Тот же цикл через RedditScraper и HTTP-сервер стаба"""
+    pytest.importorskip("aiohttp")
+    from scraper import RedditScraper
+
+    server, fake = stub_reddit.serve(port=0)
+    base_url = f"http://localhost:{server.server_address[1]}"
+
+    async def run():
+        state = SubredditState(SUB, window=20, page_limit=5)
+        async with RedditScraper(base_url, rate=1000) as scraper:
+            first = await state.refresh(scraper, now=0)
+            clock[0] += 7
+            delta = await state.refresh(scraper, now=10)
+            empty = await state.refresh(scraper, now=20)
+        return state, first, delta, empty
+
+    try:
+        state, first, delta, empty = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert (first, delta, empty) == (20, 7, 0)
+    assert window_names(state) == newest(fake, 20)
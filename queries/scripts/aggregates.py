@@ -0,0 +1,178 @@
+import threading
+import pandas as pd
+import querycache
+
+RECENT_MONTHS = 12  # line chart window, counted from today like the original query
+
+# One pass over transactions (materialized once), aggregated twice:
+#  - month x branch x type with counts and sums (every chart/CSV is a roll-up of it)
+#  - type only, for the median which can't be rolled up from finer groups; only this
+#    aggregate sorts, the fine one stays a plain hash aggregate
+# Branch/type ids come from the joined side, so NULL means "no matching row"
+# (what an inner join would have dropped). Names are joined to the groups afterwards.
+# amount_sum is in dollars; load_cube reads it as exact integer cents.
+CUBE_QUERY = f"""
+WITH x AS MATERIALIZED (
+    SELECT DATE_TRUNC('month', t.transaction_date)::DATE AS month,
+           b.branch_id,
+           tt.transaction_type_id,
+           t.transaction_id,
+           t.amount,
+           t.transaction_date >= CURRENT_DATE - INTERVAL '{RECENT_MONTHS} months' AS recent
+    FROM transactions t
+    LEFT JOIN branches b ON t.branch_id = b.branch_id
+    LEFT JOIN transaction_types tt ON t.transaction_type_id = tt.transaction_type_id
+),
+cells AS (
+    SELECT month, branch_id, transaction_type_id,
+           0 AS type_only,
+           COUNT(*) AS row_count,
+           COUNT(transaction_id) AS tx_count,
+           COUNT(transaction_id) FILTER (WHERE recent) AS recent_tx_count,
+           COUNT(amount) AS amount_count,
+           SUM(amount) AS amount_sum,
+           NULL::DOUBLE PRECISION AS median_amount
+    FROM x
+    GROUP BY month, branch_id, transaction_type_id
+    UNION ALL
+    SELECT NULL, NULL, transaction_type_id,
+           1,
+           COUNT(*),
+           COUNT(transaction_id),
+           NULL,
+           COUNT(amount),
+           SUM(amount),
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY amount)
+    FROM x
+    GROUP BY transaction_type_id
+)
+SELECT c.month,
+       c.branch_id,
+       b.branch_name,
+       c.transaction_type_id,
+       tt.type_name,
+       c.type_only,
+       c.row_count,
+       c.tx_count,
+       c.recent_tx_count,
+       c.amount_count,
+       c.amount_sum,
+       c.median_amount,
+       CURRENT_DATE AS as_of
+FROM cells c
+LEFT JOIN branches b ON c.branch_id = b.branch_id
+LEFT JOIN transaction_types tt ON c.transaction_type_id = tt.transaction_type_id;
+"""
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def load_cube():
+    """Scan transactions once and return (cube, by_type) DataFrames"""
+    # sums stay exact integer cents while they are rolled up, dollars only at the end
+    df = querycache.read_sql(CUBE_QUERY, cents=('amount_sum',)).rename(columns={'amount_sum': 'amount_cents'})
+    df['median_amount'] = df['median_amount'].astype(float)
+    df['month'] = pd.to_datetime(df['month'])
+    df['as_of'] = pd.to_datetime(df['as_of'])
+    type_only = df['type_only'] == 1
+    cube = df[~type_only].drop(columns=['type_only', 'median_amount']).reset_index(drop=True)
+    by_type = df[type_only].drop(columns=['type_only', 'month', 'branch_id', 'branch_name',
+                                          'recent_tx_count']).reset_index(drop=True)
+    print(f"Transaction cube: {len(cube)} groups from one scan")
+    return cube, by_type
+
+
+def transaction_cube():
+    """Cached (cube, by_type); concurrent callers wait for the single scan"""
+    global _cube
+    with _cube_lock:
+        if _cube is None:
+            _cube = load_cube()
+        return _cube
+
+
+def _dollars(cents):
+    return cents.astype(float) / 100
+
+
+def _sum_dollars(cents, counts):
+    """Dollar sums, NaN (NULL) where no amount was summed, like SUM over only NULLs"""
+    return _dollars(cents).round(2).where(counts > 0)
+
+
+def _as_of(cube):
+    return cube['as_of'].iloc[0] if len(cube) else pd.Timestamp.today().normalize()
+
+
+# analytics.py: bar chart
+def top_branches_by_count(limit=10):
+    cube, _ = transaction_cube()
+    df = cube[cube['branch_id'].notna()]
+    df = df.groupby('branch_name', as_index=False)['tx_count'].sum()
+    return df.sort_values('tx_count', ascending=False).head(limit).reset_index(drop=True)
+
+
+# analytics.py: horizontal bar chart
+def avg_amount_by_type():
+    cube, _ = transaction_cube()
+    df = cube[cube['transaction_type_id'].notna()]
+    df = df.groupby('type_name', as_index=False)[['amount_cents', 'amount_count']].sum()
+    df['avg_amount'] = (_dollars(df['amount_cents']) / df['amount_count']).round(2)
+    df = df.sort_values('avg_amount', ascending=False).reset_index(drop=True)
+    return df[['type_name', 'avg_amount']]
+
+
+# analytics.py: line chart (transactions of the last RECENT_MONTHS months; the first month is partial)
+def monthly_counts(months=RECENT_MONTHS):
+    if months != RECENT_MONTHS:
+        raise ValueError(f"the transaction cube only counts the last {RECENT_MONTHS} months")
+    cube, _ = transaction_cube()
+    df = cube[cube['recent_tx_count'] > 0]
+    df = df.groupby('month', as_index=False)['recent_tx_count'].sum().sort_values('month')
+    df['tx_count'] = df.pop('recent_tx_count').astype('int64')  # NULL on the type-only rows made it float
+    df['month'] = df['month'].dt.date
+    return df.reset_index(drop=True)
+
+
+# analytics.py: time slider
+def monthly_branch_amounts():
+    cube, _ = transaction_cube()
+    df = cube[cube['branch_id'].notna()]
+    df = df.groupby(['month', 'branch_name'], as_index=False, dropna=False).agg(
+        total_cents=('amount_cents', 'sum'), amount_count=('amount_count', 'sum'), tx_count=('tx_count', 'sum'))
+    df['total_amount'] = _sum_dollars(df.pop('total_cents'), df.pop('amount_count'))
+    df = df[['month', 'branch_name', 'total_amount', 'tx_count']]
+    df['month'] = df['month'].dt.date
+    return df.sort_values(['month', 'branch_name']).reset_index(drop=True)
+
+
+# main.py: query6
+def monthly_volume(months=12):
+    cube, _ = transaction_cube()
+    start = _as_of(cube).to_period('M').to_timestamp() - pd.DateOffset(months=months - 1)
+    df = cube[cube['month'] >= start]
+    df = df.groupby('month', as_index=False).agg(tx_count=('row_count', 'sum'), tx_cents=('amount_cents', 'sum'),
+                                                amount_count=('amount_count', 'sum'))
+    df['year_month'] = df['month'].dt.strftime('%Y-%m')
+    df['tx_sum'] = _sum_dollars(df['tx_cents'], df['amount_count'])
+    return df.sort_values('year_month')[['year_month', 'tx_count', 'tx_sum']].reset_index(drop=True)
+
+
+# main.py: query7
+def type_stats():
+    _, by_type = transaction_cube()
+    df = by_type.copy()
+    df['avg_amount'] = (_dollars(df['amount_cents']) / df['amount_count']).round(2)
+    df['median_amount'] = df['median_amount'].round(2)
+    df = df.sort_values('avg_amount', ascending=False, na_position='first')
+    return df[['transaction_type_id', 'type_name', 'tx_count', 'avg_amount', 'median_amount']].reset_index(drop=True)
+
+
+# transaction_trends_export.py: all-time monthly counts
+def all_time_monthly_counts():
+    cube, _ = transaction_cube()
+    df = cube.groupby('month', as_index=False, dropna=False)['tx_count'].sum()
+    df = df.rename(columns={'tx_count': 'transaction_count'}).sort_values('month')
+    df['month'] = df['month'].dt.date
+    return df.reset_index(drop=True)
@@ -1,34 +1,44 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import plotly.express as px
-from sqlalchemy import text
-from config import get_engine
+import numpy as np
+from config import iter_frames, print_pool_summary, write_query_metrics, USE_ROLLUPS, RAW_CHART_POINTS
+from config import TIME_SLIDER_HTML, TIME_SLIDER_MAX_BRANCHES
+from scheduler import run_charts
+import aggregates
+import querycache
+import instrumentation
+import rollups
+import time_slider
+import argparse
 import os
-from openpyxl import load_workbook
+from decimal import Decimal
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font
+from openpyxl.utils import get_column_letter
 from openpyxl.formatting.rule import ColorScaleRule
 
 os.makedirs('charts', exist_ok=True)
 os.makedirs('exports', exist_ok=True)
 
 def run_query(query):
-    """Execute SQL query and return DataFrame"""
-    engine = get_engine()
-    with engine.connect() as conn:
-        df = pd.read_sql(text(query), conn)
+    """Execute SQL query on a pooled connection (or the result cache) and return DataFrame"""
+    df = querycache.read_sql(query)
     print(f"Rows retrieved: {len(df)}")
     return df
 
 # 1. pie chart - Customer Distribution by Type
-def pie_chart():
+def fetch_pie_chart():
     query = """
     SELECT ct.type_name, COUNT(c.customer_id) AS count
     FROM customers c
     JOIN customer_types ct ON c.customer_type_id = ct.customer_type_id
     GROUP BY ct.type_name;
     """
-    df = run_query(query)
-    
+    return run_query(query)
+
+def render_pie_chart(df):
     plt.figure(figsize=(10, 7))
     plt.pie(df['count'], labels=df['type_name'], autopct='%1.1f%%')
     plt.title('Customer Distribution by Type')
@@ -36,18 +46,14 @@ def pie_chart():
     plt.close()
     print("Created: Pie chart - Customer types distribution\n")
 
+def pie_chart():
+    render_pie_chart(fetch_pie_chart())
+
 # 2. bar chart - Top Branches by Transactions
-def bar_chart():
-    query = """
-    SELECT b.branch_name, COUNT(t.transaction_id) AS tx_count
-    FROM transactions t
-    JOIN branches b ON t.branch_id = b.branch_id
-    GROUP BY b.branch_name
-    ORDER BY tx_count DESC
-    LIMIT 10;
-    """
-    df = run_query(query)
-    
+def fetch_bar_chart():
+    return aggregates.top_branches_by_count()
+
+def render_bar_chart(df):
     plt.figure(figsize=(10, 6))
     plt.bar(df['branch_name'], df['tx_count'], color='steelblue')
     plt.xlabel('Branch Name')
@@ -58,17 +64,14 @@ def bar_chart():
     plt.close()
     print("Created: Bar chart - Top branches by activity\n")
 
+def bar_chart():
+    render_bar_chart(fetch_bar_chart())
+
 # 3. horizontal bar - Avg Amount by Transaction Type
-def horizontal_bar_chart():
-    query = """
-    SELECT tt.type_name, AVG(t.amount)::NUMERIC(18,2) AS avg_amount
-    FROM transactions t
-    JOIN transaction_types tt ON t.transaction_type_id = tt.transaction_type_id
-    GROUP BY tt.type_name
-    ORDER BY avg_amount DESC;
-    """
-    df = run_query(query)
-    
+def fetch_horizontal_bar_chart():
+    return aggregates.avg_amount_by_type()
+
+def render_horizontal_bar_chart(df):
     plt.figure(figsize=(10, 6))
     plt.barh(df['type_name'], df['avg_amount'], color='coral')
     plt.xlabel('Average Amount ($)')
@@ -78,18 +81,16 @@ def horizontal_bar_chart():
     plt.close()
     print("Created: Horizontal bar - Avg transaction amounts\n")
 
+def horizontal_bar_chart():
+    render_horizontal_bar_chart(fetch_horizontal_bar_chart())
+
 # 4. line chart - Monthly Transaction Trends
-def line_chart():
-    query = """
-    SELECT DATE_TRUNC('month', t.transaction_date)::DATE AS month,
-           COUNT(t.transaction_id) AS tx_count
-    FROM transactions t
-    WHERE t.transaction_date >= CURRENT_DATE - INTERVAL '12 months'
-    GROUP BY month
-    ORDER BY month;
-    """
-    df = run_query(query)
-    
+def fetch_line_chart():
+    if USE_ROLLUPS:
+        return rollups.monthly_counts(months=12)
+    return aggregates.monthly_counts(months=12)
+
+def render_line_chart(df):
     plt.figure(figsize=(12, 6))
     plt.plot(df['month'], df['tx_count'], marker='o', linewidth=2)
     plt.xlabel('Month')
@@ -101,19 +102,44 @@ def line_chart():
     plt.close()
     print("Created: Line chart - Monthly transaction trends\n")
 
+def line_chart():
+    render_line_chart(fetch_line_chart())
+
+HIST_BINS = 30
+SCATTER_BALANCE_BINS = 40
+
 # 5. histogram - Account Balance Distribution
-def histogram():
-    query = """
+def fetch_histogram():
+    balances = """
     SELECT a.balance
     FROM accounts a
     JOIN account_statuses ast ON a.account_status_id = ast.account_status_id
     WHERE LOWER(ast.status_name) IN ('active', 'open')
-    AND a.balance BETWEEN -10000 AND 50000;
+    AND a.balance BETWEEN -10000 AND 50000
     """
-    df = run_query(query)
-    
+    if RAW_CHART_POINTS:
+        return run_query(balances + ";")
+    # same 30 equal-width bins over [min, max] as plt.hist, counted in SQL (max goes in the last bin)
+    query = f"""
+    WITH b AS ({balances}),
+    r AS (SELECT MIN(balance) AS lo, GREATEST(MAX(balance), MIN(balance) + 1) AS hi FROM b)
+    SELECT LEAST(width_bucket(b.balance, r.lo, r.hi, {HIST_BINS}), {HIST_BINS}) AS bucket,
+           r.lo, r.hi, COUNT(*) AS bin_count
+    FROM b CROSS JOIN r
+    GROUP BY bucket, r.lo, r.hi
+    ORDER BY bucket;
+    """
+    return run_query(query)
+
+def render_histogram(df):
     plt.figure(figsize=(10, 6))
-    plt.hist(df['balance'], bins=30, color='green', alpha=0.7)
+    if 'bin_count' in df:
+        edges = np.linspace(df['lo'].iloc[0], df['hi'].iloc[0], HIST_BINS + 1) if len(df) else np.arange(HIST_BINS + 1)
+        counts = np.zeros(HIST_BINS)
+        counts[df['bucket'].to_numpy(dtype=int) - 1] = df['bin_count']
+        plt.hist(edges[:-1], bins=edges, weights=counts, color='green', alpha=0.7)
+    else:
+        plt.hist(df['balance'], bins=HIST_BINS, color='green', alpha=0.7)
     plt.xlabel('Account Balance ($)')
     plt.ylabel('Number of Accounts')
     plt.title('Account Balance Distribution')
@@ -121,21 +147,46 @@ def histogram():
     plt.close()
     print("Created: Histogram - Balance distribution\n")
 
+def histogram():
+    render_histogram(fetch_histogram())
+
 # 6. scatter plot - Customer Age vs Balance
-def scatter_plot():
-    query = """
+def fetch_scatter_plot():
+    points = """
     SELECT EXTRACT(YEAR FROM AGE(CURRENT_DATE, c.date_of_birth)) AS age,
            SUM(a.balance)::NUMERIC(18,2) AS total_balance
     FROM customers c
     JOIN accounts a ON c.customer_id = a.customer_id
     WHERE c.date_of_birth IS NOT NULL
     GROUP BY c.customer_id, c.date_of_birth
-    HAVING SUM(a.balance) > 0;
+    HAVING SUM(a.balance) > 0
     """
-    df = run_query(query)
-    
+    if RAW_CHART_POINTS:
+        return run_query(points + ";")
+    # density grid: one-year age columns x equal-width balance rows, only non-empty cells
+    query = f"""
+    WITH p AS ({points}),
+    r AS (SELECT MIN(total_balance) AS lo, GREATEST(MAX(total_balance), MIN(total_balance) + 1) AS hi FROM p)
+    SELECT p.age,
+           LEAST(width_bucket(p.total_balance, r.lo, r.hi, {SCATTER_BALANCE_BINS}), {SCATTER_BALANCE_BINS}) AS bucket,
+           r.lo, r.hi, COUNT(*) AS bin_count
+    FROM p CROSS JOIN r
+    GROUP BY p.age, bucket, r.lo, r.hi
+    ORDER BY p.age, bucket;
+    """
+    return run_query(query)
+
+def render_scatter_plot(df):
     plt.figure(figsize=(10, 6))
-    plt.scatter(df['age'], df['total_balance'], alpha=0.5)
+    if 'bin_count' in df and len(df):
+        age_edges = np.arange(df['age'].min() - 0.5, df['age'].max() + 1.5)
+        balance_edges = np.linspace(df['lo'].iloc[0], df['hi'].iloc[0], SCATTER_BALANCE_BINS + 1)
+        centers = (balance_edges[:-1] + balance_edges[1:]) / 2
+        plt.hist2d(df['age'], centers[df['bucket'].to_numpy(dtype=int) - 1], bins=[age_edges, balance_edges],
+                   weights=df['bin_count'], cmap='Blues', cmin=1)
+        plt.colorbar(label='Customers')
+    elif 'bin_count' not in df:
+        plt.scatter(df['age'], df['total_balance'], alpha=0.5)
     plt.xlabel('Customer Age')
     plt.ylabel('Total Balance ($)')
     plt.title('Customer Age vs Total Balance')
@@ -144,19 +195,24 @@ def scatter_plot():
     plt.close()
     print("Created: Scatter plot - Age vs Balance\n")
 
+def scatter_plot():
+    render_scatter_plot(fetch_scatter_plot())
+
 # 7. time slider - Interactive Transaction Trends
-def time_slider_chart():
-    query = """
-    SELECT DATE_TRUNC('month', t.transaction_date)::DATE AS month,
-           b.branch_name,
-           SUM(t.amount)::NUMERIC(18,2) AS total_amount,
-           COUNT(t.transaction_id) AS tx_count
-    FROM transactions t
-    JOIN branches b ON t.branch_id = b.branch_id
-    GROUP BY month, b.branch_name
-    ORDER BY month, b.branch_name;
-    """
-    df = run_query(query)
+def fetch_time_slider_chart():
+    if USE_ROLLUPS:
+        return rollups.monthly_branch_amounts()
+    return aggregates.monthly_branch_amounts()
+
+def render_time_slider_chart(df):
+    filepath = "charts/time_slider.html"
+    if TIME_SLIDER_HTML == "compact":
+        page, plotly_js = time_slider.write_compact_html(
+            df, filepath, "Branch Transaction Amounts Over Time", TIME_SLIDER_MAX_BRANCHES)
+        print(f"Saved: Interactive time slider chart → {filepath} "
+              f"({page / 1024:.0f} KB + shared plotly.js {plotly_js / 1024:.0f} KB)\n")
+        return
+
     df['month'] = df['month'].astype(str)
 
     fig = px.bar(
@@ -170,9 +226,11 @@ def time_slider_chart():
         height=600
     )
 
-    filepath = "charts/time_slider.html"
     fig.write_html(filepath, auto_open=False)
-    print(f"Saved: Interactive time slider chart → {filepath}\n")
+    print(f"Saved: Interactive time slider chart → {filepath} ({os.path.getsize(filepath) / 1024:.0f} KB)\n")
+
+def time_slider_chart():
+    render_time_slider_chart(fetch_time_slider_chart())
 
 
 # 8. excel export
@@ -212,20 +270,103 @@ def export_to_excel(dataframes_dict, filename):
     wb.save(filepath)
     print(f"Excel created: {filename}, {len(dataframes_dict)} sheets, {total_rows} rows\n")
 
+def _sheet_chunks(source, chunksize):
+    """(column names, row tuples) chunks from a DataFrame, an iterable of DataFrames or a DB cursor"""
+    if hasattr(source, 'fetchmany'):
+        columns = [desc[0] for desc in source.description]
+        while True:
+            rows = source.fetchmany(chunksize)
+            if not rows:
+                break
+            yield columns, rows
+        return
+    frames = [source] if isinstance(source, pd.DataFrame) else source
+    for frame in frames:
+        if len(frame) == 0:
+            yield list(frame.columns), []
+        for start in range(0, len(frame), chunksize):
+            chunk = frame.iloc[start:start + chunksize].astype(object)
+            chunk = chunk.where(chunk.notna(), None)  # NaN/NA -> empty cell, like to_excel
+            yield list(frame.columns), list(chunk.itertuples(index=False, name=None))
+
+def export_to_excel_streaming(sheets, filename, chunksize=10_000):
+    """Same report as export_to_excel, written once with a write-only workbook.
+
+    `sheets` maps sheet name to a DataFrame, an iterable of DataFrame chunks
+    (e.g. config.iter_frames) or a cursor. Rows go straight to disk, so memory
+    stays flat however long a sheet is; styling is applied as it is written.
+    """
+    filepath = f'exports/{filename}'
+    wb = Workbook(write_only=True)
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_font = Font(color="FFFFFF", bold=True)
+    total_rows = 0
+
+    for sheet_name, source in sheets.items():
+        ws = wb.create_sheet(sheet_name)
+        ws.freeze_panes = "A2"  # sheet views are written before the rows
+        columns, numeric, rows = None, None, 0
+        for chunk_columns, chunk_rows in _sheet_chunks(source, chunksize):
+            if columns is None:
+                columns = chunk_columns
+                header = []
+                for name in columns:
+                    cell = WriteOnlyCell(ws, value=name)
+                    cell.fill = header_fill
+                    cell.font = header_font
+                    header.append(cell)
+                ws.append(header)
+            if numeric is None and chunk_rows:
+                numeric = [i for i, value in enumerate(chunk_rows[0]) if isinstance(value, (int, float, Decimal))]
+            for row in chunk_rows:
+                ws.append(row)
+            rows += len(chunk_rows)
+            instrumentation.record(rows=len(chunk_rows))
+        if columns is None:
+            continue
+
+        # filter and colour scales are written after the rows, once the last row is known
+        last_row = rows + 1
+        ws.auto_filter.ref = f"A1:{get_column_letter(len(columns))}{last_row}"
+        for i in numeric or []:
+            col_letter = get_column_letter(i + 1)
+            rule = ColorScaleRule(
+                start_type="min", start_color="F8696B",
+                mid_type="percentile", mid_value=50, mid_color="FFEB84",
+                end_type="max", end_color="63BE7B"
+            )
+            ws.conditional_formatting.add(f"{col_letter}2:{col_letter}{last_row}", rule)
+        total_rows += rows
+
+    wb.save(filepath)
+    instrumentation.record(nbytes=os.path.getsize(filepath))
+    print(f"Excel created: {filename}, {len(sheets)} sheets, {total_rows} rows\n")
+
+CHARTS = [
+    ("pie_chart", fetch_pie_chart, render_pie_chart),
+    ("bar_chart", fetch_bar_chart, render_bar_chart),
+    ("horizontal_bar_chart", fetch_horizontal_bar_chart, render_horizontal_bar_chart),
+    ("line_chart", fetch_line_chart, render_line_chart),
+    ("histogram", fetch_histogram, render_histogram),
+    ("scatter_plot", fetch_scatter_plot, render_scatter_plot),
+    ("time_slider_chart", fetch_time_slider_chart, render_time_slider_chart),
+]
+
 def main():
+    parser = argparse.ArgumentParser(description="Build charts and the Excel banking report")
+    parser.add_argument("--jobs", type=int, default=4,
+                        help="charts fetched/rendered in parallel (1 = one after another)")
+    parser.add_argument("--raw-points", action="store_true",
+                        help="histogram/scatter from every row instead of bins counted in SQL")
+    args = parser.parse_args()
+    if args.raw_points:
+        global RAW_CHART_POINTS
+        RAW_CHART_POINTS = True
+
     print("\n=== ANALYTICS START ===\n")
     
-    # Generate 6 charts
-    pie_chart()
-    bar_chart()
-    horizontal_bar_chart()
-    line_chart()
-    histogram()
-    scatter_plot()
-
-    time_slider_chart()
-    
-    engine = get_engine()
+    # Generate 6 charts + time slider; queries run together, rendering in worker processes
+    run_charts(CHARTS, jobs=args.jobs)
     
     query1 = """
     SELECT c.customer_id, c.first_name, c.last_name,
@@ -247,15 +388,18 @@ def main():
     GROUP BY at.type_name;
     """
     
-    with engine.connect() as conn:
-        df1 = pd.read_sql(text(query1), conn)
-        df2 = pd.read_sql(text(query2), conn)
+    df2 = instrumentation.measured("excel.accounts", run_query, query2)
     
-    export_to_excel({
-        'Customers': df1,
-        'Accounts': df2
-    }, 'banking_report.xlsx')
+    with instrumentation.measure("excel.report"):
+        export_to_excel_streaming({
+            # one row per customer: streamed from a server-side cursor straight into the sheet
+            'Customers': iter_frames(query1),
+            'Accounts': df2
+        }, 'banking_report.xlsx')
     
+    print_pool_summary()
+    write_query_metrics()
+    querycache.print_cache_summary()
     print("=== DONE ===\n")
 
 if __name__ == "__main__":
@@ -1,7 +1,10 @@
 import random
 import time
 from datetime import date, timedelta
-from config import get_psycopg_connection
+from config import get_psycopg_connection, print_pool_summary, write_query_metrics
+import instrumentation
+
+METRICS_EXPORT_INTERVAL = 60  # seconds between metric exports while the loop runs
 
 conn = get_psycopg_connection()
 cur = conn.cursor()
@@ -13,6 +16,7 @@ cur.execute("SELECT loan_status_id FROM loan_statuses;")
 statuses = [r[0] for r in cur.fetchall()]
 
 print("Auto loan generator started. Press Ctrl+C to stop.")
+exported = time.monotonic()
 
 try:
     while True:
@@ -27,14 +31,19 @@ try:
         
         end = start + timedelta(days=random.randint(180, 720))
 
-        cur.execute("""
-            INSERT INTO loans (
-                account_id, loan_status_id, principal_amount,
-                interest_rate, start_date, estimated_end_date
-            ) VALUES (%s, %s, %s, %s, %s, %s)
-        """, (acc, status, principal, rate, start, end))
-
-        conn.commit()
+        with instrumentation.measure("insert.loans"):
+            started = time.perf_counter()
+            cur.execute("""
+                INSERT INTO loans (
+                    account_id, loan_status_id, principal_amount,
+                    interest_rate, start_date, estimated_end_date
+                ) VALUES (%s, %s, %s, %s, %s, %s)
+            """, (acc, status, principal, rate, start, end))
+            conn.commit()
+            instrumentation.record(db=time.perf_counter() - started, rows=1, nbytes=len(cur.query))
+        if time.monotonic() - exported >= METRICS_EXPORT_INTERVAL:
+            write_query_metrics()  # long-running: keep the exported file current, but not per insert
+            exported = time.monotonic()
         print(f"Loan {principal}, {start}, {end} inserted.")
         time.sleep(10)
 except KeyboardInterrupt:
@@ -42,3 +51,5 @@ except KeyboardInterrupt:
 finally:
     cur.close()
     conn.close()
+    print_pool_summary()
+    write_query_metrics()
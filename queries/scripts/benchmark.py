@@ -0,0 +1,371 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import psycopg2
+from sqlalchemy import text
+import config
+from config import get_engine, get_psycopg_connection, fetch_frame, print_pool_summary
+
+TESTING_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testing', 'queries.sql')
+
+SCALES = {'50k': 50_000, '1m': 1_000_000, '10m': 10_000_000}
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')[:40]
+
+
+def testing_queries(path=TESTING_SQL):
+    """Queries from queries/testing/queries.sql keyed by their '-- N) Title' comment"""
+    with open(path, encoding='utf-8') as f:
+        sql = f.read()
+    queries = {}
+    for block in re.split(r'\n(?=-- \d+\))', sql):
+        header = re.match(r'-- (\d+)\) (.*)', block.strip())
+        if not header:
+            continue
+        body = "\n".join(line for line in block.splitlines() if not line.startswith('--')).strip()
+        queries[f"testing.{int(header.group(1)):02d}_{_slug(header.group(2))}"] = body
+    return queries
+
+
+def catalogue():
+    """Every workload we track: main.py's query1..query11 plus queries/testing/queries.sql"""
+    import main
+    queries = {f"main.query{i}": getattr(main, f"query{i}") for i in range(1, 12)}
+    queries["main.query4_fast"] = main.query4_fast
+    queries.update(testing_queries())
+    return queries
+
+
+def seed(scale):
+    """Top the transactions table up to the given row count with the load generator.
+
+    Only transactions are grown; the other tables keep their dataset size.
+    """
+    import load_generator
+    target = SCALES.get(scale) or int(scale)
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM transactions;")
+            current = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    if current >= target:
+        print(f"transactions already has {current} rows (target {target}); use a separate database for smaller scales")
+    else:
+        load_generator.generate('transactions', target - current, batch_size=20_000,
+                                workers=min(4, os.cpu_count() or 1), seed=1, method='copy')
+    conn = get_psycopg_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE;")
+    finally:
+        conn.autocommit = False
+        conn.close()
+    print(f"Seeded at scale {scale} ({max(current, target)} transactions), statistics refreshed")
+
+
+def _timed_fetch(cur, sql):
+    start = time.perf_counter()
+    cur.execute(sql)
+    rows = cur.fetchall()
+    return (time.perf_counter() - start) * 1000, len(rows)
+
+
+def _fresh_connection():
+    # outside the pool on purpose: a brand-new backend has empty plan and catalog caches
+    return psycopg2.connect(dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
+                            host=config.DB_HOST, port=config.DB_PORT)
+
+
+def _plan_summary(plan):
+    top = plan[0]
+    node = top['Plan']
+    return {
+        'execution_ms': top.get('Execution Time'),
+        'planning_ms': top.get('Planning Time'),
+        'shared_hit_blocks': node.get('Shared Hit Blocks'),
+        'shared_read_blocks': node.get('Shared Read Blocks'),
+        'top_node': node.get('Node Type'),
+    }
+
+
+def bench_query(sql, runs, cold_runs, cold_command=None):
+    """Latencies (ms) for cold and warm executions plus the EXPLAIN ANALYZE plan"""
+    cold = []
+    for _ in range(cold_runs):
+        if cold_command:
+            subprocess.run(cold_command, shell=True, check=True)
+        conn = _fresh_connection()
+        try:
+            with conn.cursor() as cur:
+                ms, _ = _timed_fetch(cur, sql)
+            cold.append(ms)
+        finally:
+            conn.close()
+
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            _, rows = _timed_fetch(cur, sql)  # warm-up
+            warm = [_timed_fetch(cur, sql)[0] for _ in range(runs)]
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql)
+            plan = cur.fetchone()[0]
+        conn.rollback()
+    finally:
+        conn.close()
+
+    return {
+        'rows': rows,
+        'warm_ms': warm,
+        'p50_ms': float(np.percentile(warm, 50)),
+        'p95_ms': float(np.percentile(warm, 95)),
+        'cold_ms': cold,
+        'cold_p50_ms': float(np.percentile(cold, 50)) if cold else None,
+        'plan_summary': _plan_summary(plan),
+        'plan': plan,
+    }
+
+
+def _table_counts():
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            counts = {}
+            for table in ('customers', 'accounts', 'loans', 'transactions'):
+                cur.execute(f"SELECT COUNT(*) FROM {table};")
+                counts[table] = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+
+def run(runs, cold_runs, only=None, cold_command=None, label=None, out_dir='benchmarks'):
+    queries = catalogue()
+    if only:
+        queries = {name: sql for name, sql in queries.items() if re.search(only, name)}
+    results = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'label': label,
+            'runs': runs,
+            'cold_runs': cold_runs,
+            'cold_command': cold_command,
+            'table_rows': _table_counts(),
+        },
+        'queries': {},
+    }
+    print(f"{'query':<50}{'rows':>8}{'p50, ms':>10}{'p95, ms':>10}{'cold, ms':>10}")
+    for name, sql in queries.items():
+        res = bench_query(sql, runs, cold_runs, cold_command)
+        res['sql'] = sql
+        results['queries'][name] = res
+        cold = f"{res['cold_p50_ms']:.1f}" if res['cold_p50_ms'] is not None else '-'
+        print(f"{name:<50}{res['rows']:>8}{res['p50_ms']:>10.1f}{res['p95_ms']:>10.1f}{cold:>10}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(out_dir, f"{stamp}{'_' + _slug(label) if label else ''}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\nResults saved: {path}")
+    return path
+
+
+def _read_sql_decimal(sql):
+    # the pre-fetch_frame path: pd.read_sql over psycopg2's Decimal conversion, whole result at once
+    with get_engine().connect() as conn:
+        return pd.read_sql(text(sql), conn)
+
+
+def _measure(read, runs):
+    """Median wall time, peak Python allocations during one read and the frame's own size"""
+    read()  # warm-up
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        df = read()
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    df = read()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'rows': len(df),
+        'p50_ms': float(np.percentile(times, 50)),
+        'peak_mb': peak / 1024 / 1024,
+        'frame_mb': df.memory_usage(deep=True).sum() / 1024 / 1024,
+        'object_columns': int((df.dtypes == object).sum()),
+    }
+
+
+FETCH_PATHS = {
+    'read_sql': lambda sql, chunksize: _read_sql_decimal(sql),
+    'fetch_frame': lambda sql, chunksize: fetch_frame(sql),
+    'fetch_frame_chunked': lambda sql, chunksize: fetch_frame(sql, chunksize=chunksize),
+}
+
+
+def fetch_bench(runs, only=None, chunksize=10_000, label=None, out_dir='benchmarks'):
+    """Time and memory of DataFrame reads: pd.read_sql vs config.fetch_frame (whole and chunked)"""
+    queries = catalogue()
+    if only:
+        queries = {name: sql for name, sql in queries.items() if re.search(only, name)}
+    results = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'label': label,
+            'runs': runs,
+            'chunksize': chunksize,
+            'numeric_as_float': config.NUMERIC_AS_FLOAT,
+            'table_rows': _table_counts(),
+        },
+        'queries': {},
+    }
+    print(f"{'query':<40}{'path':<22}{'rows':>8}{'p50, ms':>10}{'peak, MB':>10}{'frame, MB':>10}{'object':>8}")
+    for name, sql in queries.items():
+        results['queries'][name] = {}
+        for path, read in FETCH_PATHS.items():
+            res = _measure(lambda: read(sql, chunksize), runs)
+            results['queries'][name][path] = res
+            print(f"{name:<40}{path:<22}{res['rows']:>8}{res['p50_ms']:>10.1f}"
+                  f"{res['peak_mb']:>10.1f}{res['frame_mb']:>10.1f}{res['object_columns']:>8}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(out_dir, f"fetch_{stamp}{'_' + _slug(label) if label else ''}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\nResults saved: {path}")
+    return path
+
+
+def _customers_frame(rows, seed=1):
+    """Synthetic sheet shaped like the report's Customers sheet"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'customer_id': np.arange(1, rows + 1),
+        'first_name': rng.choice(['Anna', 'Ivan', 'Maria', 'Oleg', 'Olga', 'Petr'], size=rows),
+        'last_name': rng.choice(['Ivanova', 'Petrov', 'Sidorova', 'Smirnov', 'Volkov'], size=rows),
+        'customer_type': rng.choice(['Individual', 'Business'], size=rows),
+        'accounts': rng.integers(0, 5, size=rows),
+        'total_balance': np.round(rng.normal(15_000, 8_000, size=rows), 2),
+    })
+
+
+def excel_bench(rows, chunksize=10_000):
+    """Time and peak Python memory of export_to_excel vs export_to_excel_streaming on the same data"""
+    import analytics
+    df = _customers_frame(rows)
+    accounts = df.groupby('customer_type', as_index=False)['total_balance'].mean()
+    writers = {
+        'export_to_excel': lambda: analytics.export_to_excel(
+            {'Customers': df, 'Accounts': accounts}, 'bench_openpyxl.xlsx'),
+        'export_to_excel_streaming': lambda: analytics.export_to_excel_streaming(
+            {'Customers': (df.iloc[i:i + chunksize] for i in range(0, rows, chunksize)), 'Accounts': accounts},
+            'bench_streaming.xlsx', chunksize),
+    }
+    results = {}
+    for name, write in writers.items():
+        start = time.perf_counter()
+        write()
+        seconds = time.perf_counter() - start
+        tracemalloc.start()
+        write()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {'seconds': seconds, 'peak_mb': peak / 1024 / 1024}
+    print(f"{'writer':<30}{'rows':>10}{'seconds':>10}{'peak, MB':>10}")
+    for name, res in results.items():
+        print(f"{name:<30}{rows:>10}{res['seconds']:>10.1f}{res['peak_mb']:>10.1f}")
+    return results
+
+
+def compare(old_path, new_path, threshold):
+    """Print p50/p95 changes between two result files; returns names that regressed"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)['queries']
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)['queries']
+
+    regressions = []
+    print(f"{'query':<50}{'old p50':>10}{'new p50':>10}{'change':>9}{'old p95':>10}{'new p95':>10}")
+    for name in sorted(set(old) | set(new)):
+        if name not in old or name not in new:
+            print(f"{name:<50}  only in {'new' if name in new else 'old'} run")
+            continue
+        o, n = old[name], new[name]
+        change = (n['p50_ms'] - o['p50_ms']) / o['p50_ms'] if o['p50_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<50}{o['p50_ms']:>10.1f}{n['p50_ms']:>10.1f}{change:>+9.0%}"
+              f"{o['p95_ms']:>10.1f}{n['p95_ms']:>10.1f}{flag}")
+    print(f"\n{len(regressions)} regression(s) above {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQL query catalogue")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_seed = sub.add_parser("seed", help="grow transactions to a benchmark scale")
+    p_seed.add_argument("scale", help="50k, 1m, 10m or a row count")
+
+    p_run = sub.add_parser("run", help="time every catalogued query and save JSON results")
+    p_run.add_argument("--runs", type=int, default=10, help="warm executions per query")
+    p_run.add_argument("--cold-runs", type=int, default=3,
+                       help="executions on a fresh connection per query")
+    p_run.add_argument("--cold-command",
+                       help="shell command run before each cold execution, e.g. restart Postgres and drop OS caches")
+    p_run.add_argument("--only", help="regex on query names")
+    p_run.add_argument("--label", help="tag added to the result file name")
+    p_run.add_argument("--out-dir", default="benchmarks")
+
+    p_cmp = sub.add_parser("compare", help="diff two result files")
+    p_cmp.add_argument("old")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.2, help="p50 slowdown flagged as regression (0.2 = 20%%)")
+
+    p_fetch = sub.add_parser("fetch", help="compare DataFrame fetch paths: time, peak memory, frame size")
+    p_fetch.add_argument("--runs", type=int, default=5, help="timed reads per query and path")
+    p_fetch.add_argument("--chunksize", type=int, default=10_000, help="rows per chunk for the chunked path")
+    p_fetch.add_argument("--only", help="regex on query names")
+    p_fetch.add_argument("--label", help="tag added to the result file name")
+    p_fetch.add_argument("--out-dir", default="benchmarks")
+
+    p_excel = sub.add_parser("excel", help="compare the Excel report writers on a synthetic customers sheet")
+    p_excel.add_argument("--rows", type=int, default=200_000)
+    p_excel.add_argument("--chunksize", type=int, default=10_000)
+
+    args = parser.parse_args()
+    if args.command == "excel":
+        excel_bench(args.rows, args.chunksize)
+        return
+    if args.command == "compare":
+        regressions = compare(args.old, args.new, args.threshold)
+        sys.exit(1 if regressions else 0)
+    if args.command == "seed":
+        seed(args.scale)
+    elif args.command == "fetch":
+        fetch_bench(args.runs, args.only, args.chunksize, args.label, args.out_dir)
+    else:
+        run(args.runs, args.cold_runs, args.only, args.cold_command, args.label, args.out_dir)
+    print_pool_summary()
+
+if __name__ == "__main__":
+    main()
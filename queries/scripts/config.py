@@ -1,7 +1,12 @@
 import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import psycopg2.extensions
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-import psycopg2
+from sqlalchemy import create_engine, event
+import instrumentation
 
 load_dotenv()
 
@@ -11,16 +16,158 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT", "5432")
 
+# connection pool settings (shared by every script in this folder)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "2"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = no timeout
+
+# read monthly charts/exports and the top-customers ranking from rollup tables instead of scanning transactions
+USE_ROLLUPS = os.getenv("USE_ROLLUPS", "0") == "1"
+
+# histogram/scatter: pull every point instead of bins counted in SQL (fine for small data)
+RAW_CHART_POINTS = os.getenv("RAW_CHART_POINTS", "0") == "1"
+
+# time slider page: "compact" (data once, shared plotly.js) or "full" (plotly write_html); 0 = no branch cap
+TIME_SLIDER_HTML = os.getenv("TIME_SLIDER_HTML", "compact")
+TIME_SLIDER_MAX_BRANCHES = int(os.getenv("TIME_SLIDER_MAX_BRANCHES", "20"))
+
+# on-disk result cache for read queries (see querycache.py)
+QUERY_CACHE = os.getenv("QUERY_CACHE", "1") == "1"
+QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR", ".query_cache")
+QUERY_CACHE_MAX_MB = int(os.getenv("QUERY_CACHE_MAX_MB", "512"))
+
+# fetch_frame: NUMERIC as float64 instead of Decimal objects, rows per server-side cursor fetch
+NUMERIC_AS_FLOAT = os.getenv("NUMERIC_AS_FLOAT", "1") == "1"
+FETCH_CHUNK_ROWS = int(os.getenv("FETCH_CHUNK_ROWS", "50000"))
+
+# client-side query/insert metrics (instrumentation.py): node_exporter textfile directory and/or push gateway
+METRICS_TEXTFILE_DIR = os.getenv("METRICS_TEXTFILE_DIR", "")
+METRICS_PUSHGATEWAY = os.getenv("METRICS_PUSHGATEWAY", "")
+
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+_engine = None
+_engine_lock = threading.Lock()
+_connections_opened = 0
+
+
+def _on_connect(dbapi_connection, connection_record):
+    global _connections_opened
+    _connections_opened += 1
+
+
 def get_engine():
-    return create_engine(DATABASE_URL)
+    """Return the process-wide pooled engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                connect_args = {}
+                if DB_STATEMENT_TIMEOUT_MS > 0:
+                    connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+                engine = create_engine(
+                    DATABASE_URL,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                    connect_args=connect_args,
+                )
+                event.listen(engine, "connect", _on_connect)
+                _engine = engine
+    return _engine
+
+
+def reset_engine_after_fork():
+    """Forget pooled connections inherited from the parent process.
+
+    Call this first thing in a forked worker so the child never reuses or
+    closes sockets that still belong to the parent.
+    """
+    if _engine is not None:
+        _engine.dispose(close=False)
+
 
 def get_psycopg_connection():
-    return psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT
-    )
\ No newline at end of file
+    """Borrow a raw psycopg2 connection from the shared pool.
+
+    close() hands the connection back to the pool instead of closing it.
+    """
+    return get_engine().raw_connection()
+
+
+def connections_opened():
+    """Number of physical connections opened by the pool so far"""
+    return _connections_opened
+
+
+def print_pool_summary():
+    pool = get_engine().pool
+    print(f"DB connections opened: {connections_opened()} "
+          f"(pool size {DB_POOL_SIZE}, overflow {DB_MAX_OVERFLOW}, checked out now {pool.checkedout()})")
+
+
+# NUMERIC text straight to float, skipping the Decimal objects psycopg2 builds by default
+NUMERIC_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, "NUMERIC_FLOAT",
+    lambda value, cur: float(value) if value is not None else None)
+
+# below this a 2-decimal value survives float -> round(x * 100) unchanged
+MAX_EXACT_CENTS = 2 ** 53 // 100
+
+
+def _to_cents(values, name):
+    values = values.astype(float)
+    if values.abs().max() >= MAX_EXACT_CENTS:
+        raise ValueError(f"{name}: values too large to convert to cents exactly")
+    return np.rint(values * 100).astype("Int64")
+
+
+def iter_frames(query, params=None, chunksize=FETCH_CHUNK_ROWS, cents=()):
+    """Yield the result as DataFrames of at most `chunksize` rows.
+
+    Rows come from a server-side cursor, so only one chunk is held as Python
+    tuples at a time. NUMERIC columns are float64 (see NUMERIC_AS_FLOAT);
+    columns listed in `cents` become exact Int64 amounts in cents. `params`
+    use psycopg2 placeholders (%(name)s). Always yields at least one frame.
+    """
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor(name="fetch_frame") as cur:
+            if NUMERIC_AS_FLOAT:
+                psycopg2.extensions.register_type(NUMERIC_FLOAT, cur)
+            cur.itersize = chunksize
+            # on a named cursor execute() is only DECLARE; the query runs on the first fetch,
+            # so that fetch counts as db time and later batches as fetch time
+            started = time.perf_counter()
+            cur.execute(query.strip().rstrip(';'), params)
+            first = True
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if first:
+                    instrumentation.record(db=time.perf_counter() - started)
+                    started = time.perf_counter()
+                if not rows and not first:
+                    break
+                df = pd.DataFrame.from_records(rows, columns=[desc[0] for desc in cur.description])
+                for col in cents:
+                    df[col] = _to_cents(df[col], col)
+                instrumentation.record(fetch=time.perf_counter() - started)
+                first = False
+                yield df
+                started = time.perf_counter()
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def fetch_frame(query, params=None, chunksize=FETCH_CHUNK_ROWS, cents=()):
+    """Whole result as one typed DataFrame, read in chunks (see iter_frames)"""
+    frames = list(iter_frames(query, params, chunksize, cents))
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def write_query_metrics():
+    """Export the measured steps (see instrumentation.py) if a textfile dir or push gateway is set"""
+    if METRICS_TEXTFILE_DIR or METRICS_PUSHGATEWAY:
+        instrumentation.export(METRICS_TEXTFILE_DIR or None, METRICS_PUSHGATEWAY or None)
@@ -0,0 +1,235 @@
+import argparse
+import io
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from config import get_psycopg_connection, print_pool_summary
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'csv_to_sql')
+
+# table -> columns in CSV order as (db column, type); the first column is the primary key.
+# CSV columns are matched by position, like \copy in copy.sql.
+TABLES = {
+    'account_statuses': [('account_status_id', 'int'), ('status_name', 'text')],
+    'account_types': [('account_type_id', 'int'), ('type_name', 'text')],
+    'customer_types': [('customer_type_id', 'int'), ('type_name', 'text')],
+    'transaction_types': [('transaction_type_id', 'int'), ('type_name', 'text')],
+    'loan_statuses': [('loan_status_id', 'int'), ('status_name', 'text')],
+    'addresses': [('address_id', 'int'), ('street', 'text'), ('city', 'text'), ('country', 'text')],
+    'branches': [('branch_id', 'int'), ('branch_name', 'text'), ('address_id', 'int')],
+    'customers': [('customer_id', 'int'), ('first_name', 'text'), ('last_name', 'text'),
+                  ('date_of_birth', 'date'), ('address_id', 'int'), ('customer_type_id', 'int')],
+    'accounts': [('account_id', 'int'), ('customer_id', 'int'), ('account_type_id', 'int'),
+                 ('account_status_id', 'int'), ('balance', 'numeric'), ('opening_date', 'date')],
+    'loans': [('loan_id', 'int'), ('account_id', 'int'), ('loan_status_id', 'int'),
+              ('principal_amount', 'numeric'), ('interest_rate', 'numeric'),
+              ('start_date', 'date'), ('estimated_end_date', 'date')],
+    'transactions': [('transaction_id', 'int'), ('account_origin_id', 'int'),
+                     ('account_destination_id', 'int'), ('transaction_type_id', 'int'),
+                     ('amount', 'numeric'), ('transaction_date', 'timestamp'),
+                     ('branch_id', 'int'), ('description', 'text')],
+}
+
+# what raw.safe_date / raw.safe_timestamp return: their first try is a plain ::date / ::timestamp
+# cast, which reads 01/02/2024 and 01-02-2024 month first under the default DateStyle (MDY).
+# Day-first forms only catch what that cast rejects, such as 13/01/2024.
+DATE_FORMATS = ['ISO8601', '%m/%d/%Y', '%m-%d-%Y', '%d/%m/%Y', '%d-%m-%Y']
+TIMESTAMP_FORMATS = ['ISO8601', '%m/%d/%Y %H:%M:%S', '%m-%d-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S',
+                     '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S']
+
+
+# vectorized versions of the raw.safe_* helpers; each returns strings ready for COPY ('' = NULL)
+
+def parse_text(col):
+    return col.str.strip()
+
+
+def parse_int(col):
+    return col.where(col.str.fullmatch(r'-?\d+'), '')
+
+
+def parse_numeric(col):
+    col = col.str.replace(r'[^0-9.\-]', '', regex=True)
+    valid = pd.to_numeric(col, errors='coerce').notna()
+    return col.where(valid, '')
+
+
+def _parse_datetime(col, formats, out_format):
+    col = col.str.strip()
+    parsed = pd.Series(pd.NaT, index=col.index, dtype='datetime64[ns]')
+    for fmt in formats:
+        missing = parsed.isna() & (col != '')
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(col[missing], format=fmt, errors='coerce')
+    return parsed.dt.strftime(out_format).fillna('')
+
+
+def parse_date(col):
+    return _parse_datetime(col, DATE_FORMATS, '%Y-%m-%d')
+
+
+def parse_timestamp(col):
+    return _parse_datetime(col, TIMESTAMP_FORMATS, '%Y-%m-%d %H:%M:%S')
+
+
+PARSERS = {
+    'int': parse_int,
+    'numeric': parse_numeric,
+    'date': parse_date,
+    'timestamp': parse_timestamp,
+    'text': parse_text,
+}
+
+
+class SeenIds:
+    """Primary keys already loaded, so duplicates keep the first row (ON CONFLICT DO NOTHING).
+
+    Ids in [0, BITMAP_LIMIT) live in a growing bitmap; the rare others in a set.
+    """
+
+    BITMAP_LIMIT = 1 << 26
+
+    def __init__(self):
+        self.bitmap = np.zeros(1 << 16, dtype=bool)
+        self.others = set()
+
+    def filter_new(self, ids):
+        ids = ids.to_numpy(dtype=np.int64)
+        keep = np.ones(len(ids), dtype=bool)
+        in_bitmap = (ids >= 0) & (ids < self.BITMAP_LIMIT)
+        for i in np.flatnonzero(~in_bitmap):
+            keep[i] = ids[i] not in self.others
+            self.others.add(ids[i])
+        small = ids[in_bitmap]
+        if len(small) and small.max() >= len(self.bitmap):
+            grown = np.zeros(min(max(int(small.max()) + 1, 2 * len(self.bitmap)), self.BITMAP_LIMIT), dtype=bool)
+            grown[:len(self.bitmap)] = self.bitmap
+            self.bitmap = grown
+        keep[in_bitmap] = ~self.bitmap[small]
+        self.bitmap[small] = True
+        return keep
+
+
+def clean_chunk(chunk, columns, seen):
+    """Parse one chunk of raw strings; drop rows with a bad or duplicate primary key"""
+    out = pd.DataFrame({name: PARSERS[kind](chunk[name]) for name, kind in columns})
+    pk = columns[0][0]
+    out = out[out[pk] != '']
+    out = out[~out[pk].duplicated()]
+    return out[seen.filter_new(out[pk].astype(np.int64))]
+
+
+def _statement_names(path, pattern):
+    with open(path, encoding='utf-8') as f:
+        return re.findall(pattern, f.read())
+
+
+def _run_sql_file(cur, filename):
+    with open(os.path.join(SQL_DIR, filename), encoding='utf-8') as f:
+        cur.execute(f.read())
+
+
+def drop_indexes_and_fks(conn):
+    """Drop what indexes.sql / foreign_keys.sql create, so COPY doesn't maintain them row by row"""
+    fks = _statement_names(os.path.join(SQL_DIR, 'foreign_keys.sql'),
+                           r'ALTER TABLE (\w+)\s+ADD CONSTRAINT (\w+)')
+    indexes = _statement_names(os.path.join(SQL_DIR, 'indexes.sql'),
+                               r'CREATE INDEX IF NOT EXISTS (\w+)')
+    with conn.cursor() as cur:
+        for table, name in fks:
+            cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name};")
+        for name in indexes:
+            cur.execute(f"DROP INDEX IF EXISTS {name};")
+    conn.commit()
+    return fks
+
+
+def load_table(conn, table, path, chunk_size):
+    """Stream one CSV into its typed table; returns (rows read, rows loaded, seconds)"""
+    columns = TABLES[table]
+    names = [name for name, _ in columns]
+    copy_sql = f"COPY {table} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv, FREEZE)"
+    seen = SeenIds()
+    rows_read = rows_loaded = 0
+    start = time.perf_counter()
+
+    with conn.cursor() as cur:
+        # truncate in the same transaction so COPY can use FREEZE (no later hint-bit rewrite)
+        cur.execute(f"TRUNCATE {table};")
+        reader = pd.read_csv(path, header=0, usecols=range(len(names)), dtype=str,
+                             keep_default_na=False, chunksize=chunk_size)
+        for chunk in reader:
+            chunk.columns = names
+            rows_read += len(chunk)
+            clean = clean_chunk(chunk, columns, seen)
+            buf = io.StringIO()
+            clean.to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cur.copy_expert(copy_sql, buf)
+            rows_loaded += len(clean)
+    conn.commit()
+    return rows_read, rows_loaded, time.perf_counter() - start
+
+
+def finish_load(conn, fks, validate):
+    """Build indexes, add FKs as NOT VALID, then validate each one"""
+    with conn.cursor() as cur:
+        start = time.perf_counter()
+        _run_sql_file(cur, 'indexes.sql')
+        conn.commit()
+        print(f"Indexes built in {time.perf_counter() - start:.1f}s")
+
+        _run_sql_file(cur, 'foreign_keys.sql')
+        conn.commit()
+
+        if not validate:
+            print("Foreign keys added as NOT VALID (validation skipped)")
+            return
+        for table, name in fks:
+            start = time.perf_counter()
+            try:
+                cur.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name};")
+                conn.commit()
+                print(f"  {name}: valid ({time.perf_counter() - start:.1f}s)")
+            except Exception as e:
+                conn.rollback()
+                print(f"  {name}: NOT valid, see checkers.sql ({str(e).splitlines()[0]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load the dataset CSVs into the typed tables with COPY")
+    parser.add_argument("data_dir", help="folder with <table>.csv files")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES),
+                        help="load only these tables")
+    parser.add_argument("--chunk-size", type=int, default=200_000, help="CSV rows parsed per chunk")
+    parser.add_argument("--no-validate", action="store_true", help="leave foreign keys NOT VALID")
+    args = parser.parse_args()
+
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            _run_sql_file(cur, 'tables.sql')
+        conn.commit()
+        fks = drop_indexes_and_fks(conn)
+
+        print(f"{'table':<20}{'read':>12}{'loaded':>12}{'seconds':>10}{'rows/s':>12}")
+        total_start = time.perf_counter()
+        for table in args.tables:
+            path = os.path.join(args.data_dir, f"{table}.csv")
+            if not os.path.exists(path):
+                print(f"{table:<20}  skipped, {path} not found")
+                continue
+            read, loaded, seconds = load_table(conn, table, path, args.chunk_size)
+            print(f"{table:<20}{read:>12}{loaded:>12}{seconds:>10.1f}{loaded / max(seconds, 1e-9):>12.0f}")
+
+        finish_load(conn, fks, validate=not args.no_validate)
+        print(f"Total: {time.perf_counter() - total_start:.1f}s")
+    finally:
+        conn.close()
+    print_pool_summary()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# One histogram per measure, labelled by script and step name ("chart.<name>",
+# "main.<export filename>", "insert.transactions", ...). Steps are only recorded as tuples
+# here; prometheus_client is imported and the histograms are filled on the first export(),
+# so scripts run without it while metrics are off.
+LABELS = ['script', 'step']
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+ROWS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTES = (1024, 16 * 1024, 256 * 1024, 4 * 1024 ** 2, 64 * 1024 ** 2, 1024 ** 3)
+
+SCRIPT = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+
+_local = threading.local()
+
+
+class Step:
+    """Totals for one measured step; low-level readers/writers add to the current one"""
+
+    def __init__(self, name):
+        self.name = name
+        self.db = self.fetch = 0.0
+        self.rows = self.bytes = 0
+
+
+@contextmanager
+def measure(name):
+    """Time a named step; db/fetch/rows/bytes are added with record() while it runs"""
+    step = Step(name)
+    parent = getattr(_local, 'step', None)
+    _local.step = step
+    started = time.perf_counter()
+    try:
+        yield step
+    finally:
+        _local.step = parent
+        observe(step.name, time.perf_counter() - started, step.db, step.fetch, step.rows, step.bytes)
+
+
+def measured(name, fetch, *args):
+    """fetch(*args) as a measured step; rows/bytes are taken from the DataFrame it returns"""
+    with measure(name):
+        df = fetch(*args)
+        record(rows=len(df), nbytes=int(df.memory_usage(deep=True).sum()))
+    return df
+
+
+def record(db=0.0, fetch=0.0, rows=0, nbytes=0):
+    """Add to the step measured in this thread, if any"""
+    step = getattr(_local, 'step', None)
+    if step is None:
+        return
+    step.db += db
+    step.fetch += fetch
+    step.rows += rows
+    step.bytes += nbytes
+
+
+_completed = []  # observations made in this process, for handing back from worker processes
+_metrics = None  # (registry, histograms, last_run gauge), built by the first export
+_exported = 0  # observations already put into the histograms
+
+
+def _registry():
+    """Our own registry, so only report metrics end up in the textfile / push gateway"""
+    global _metrics
+    if _metrics is None:
+        from prometheus_client import CollectorRegistry, Gauge, Histogram
+
+        registry = CollectorRegistry()
+        histograms = [
+            Histogram('report_step_wall_seconds', 'Wall time of a query/insert step in the client',
+                      LABELS, buckets=SECONDS, registry=registry),
+            Histogram('report_step_db_seconds',
+                      'Time spent in execute/commit or the first fetch of a streamed read (waiting for the database)',
+                      LABELS, buckets=SECONDS, registry=registry),
+            Histogram('report_step_fetch_seconds', 'Time spent fetching rows and building frames',
+                      LABELS, buckets=SECONDS, registry=registry),
+            Histogram('report_step_rows', 'Rows returned or written by a step',
+                      LABELS, buckets=ROWS, registry=registry),
+            Histogram('report_step_bytes', 'Bytes of the result in memory, of the file written or of the insert payload',
+                      LABELS, buckets=BYTES, registry=registry),
+        ]
+        last_run = Gauge('report_last_run_unix', 'When the script last exported its metrics', ['script'],
+                         registry=registry)
+        _metrics = (registry, histograms, last_run)
+    return _metrics
+
+
+def observe(name, wall, db, fetch, rows, nbytes):
+    _completed.append((name, wall, db, fetch, rows, nbytes))
+
+
+def completed(since=0):
+    """Observations made in this process from index `since` on (plain tuples, picklable)"""
+    return _completed[since:]
+
+
+def replay(observations):
+    """Observe steps measured in another process"""
+    for obs in observations:
+        observe(*obs)
+
+
+def export(textfile_dir=None, pushgateway=None, job='d_vision_reports'):
+    """Write <script>.prom for the node_exporter textfile collector and/or push to a gateway"""
+    global _exported
+    from prometheus_client import push_to_gateway, write_to_textfile
+
+    registry, histograms, last_run = _registry()
+    observations = _completed[_exported:]
+    _exported += len(observations)
+    for name, *values in observations:
+        for histogram, value in zip(histograms, values):
+            histogram.labels(SCRIPT, name).observe(value)
+    last_run.labels(SCRIPT).set_to_current_time()
+    if textfile_dir:
+        os.makedirs(textfile_dir, exist_ok=True)
+        write_to_textfile(os.path.join(textfile_dir, f"{SCRIPT}.prom"), registry)
+    if pushgateway:
+        try:
+            push_to_gateway(pushgateway, job=job, grouping_key={'script': SCRIPT}, registry=registry)
+        except OSError as e:
+            print(f"Metrics push to {pushgateway} failed: {e}")
@@ -0,0 +1,270 @@
+import argparse
+import io
+import multiprocessing as mp
+import os
+import time
+from datetime import datetime
+import numpy as np
+from psycopg2.extras import execute_values
+from config import get_psycopg_connection, reset_engine_after_fork, print_pool_summary, write_query_metrics, USE_ROLLUPS
+import instrumentation
+import rollups
+
+TX_COLUMNS = ['transaction_id', 'account_origin_id', 'account_destination_id', 'transaction_type_id',
+              'amount', 'transaction_date', 'branch_id', 'description']
+LOAN_COLUMNS = ['loan_id', 'account_id', 'loan_status_id', 'principal_amount',
+                'interest_rate', 'start_date', 'estimated_end_date']
+
+TABLES = {
+    'transactions': ('transaction_id', TX_COLUMNS),
+    'loans': ('loan_id', LOAN_COLUMNS),
+}
+
+
+def _fetch_ids(cur, query):
+    cur.execute(query)
+    return np.array([r[0] for r in cur.fetchall()], dtype=np.int64)
+
+
+def load_reference_data(table):
+    """Ids the generated rows point to, as NumPy arrays"""
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            ref = {'accounts': _fetch_ids(cur, "SELECT account_id FROM accounts;")}
+            if table == 'transactions':
+                ref['types'] = _fetch_ids(cur, "SELECT transaction_type_id FROM transaction_types;")
+                ref['branches'] = _fetch_ids(cur, "SELECT branch_id FROM branches;")
+            else:
+                ref['statuses'] = _fetch_ids(cur, "SELECT loan_status_id FROM loan_statuses;")
+        conn.commit()
+    finally:
+        conn.close()
+    for name, ids in ref.items():
+        if len(ids) == 0 or (name == 'accounts' and len(ids) < 2):
+            raise RuntimeError(f"Not enough rows in {name} to generate {table}")
+    return ref
+
+
+def _random_datetimes(rng, n, start, end):
+    # datetime64 arithmetic keeps the naive wall-clock values, .timestamp() would shift them by the local UTC offset
+    start64 = np.datetime64(start, 's')
+    span = (np.datetime64(end, 's') - start64).astype(np.int64)
+    return start64 + rng.integers(0, span, size=n).astype('timedelta64[s]')
+
+
+def make_transactions(rng, ref, first_id, n, start, end):
+    accounts = ref['accounts']
+    origin = rng.integers(0, len(accounts), size=n)
+    # pick destination among the other n-1 accounts, so origin != destination without retries
+    dest = rng.integers(0, len(accounts) - 1, size=n)
+    dest += dest >= origin
+    # log-normal amounts: mostly small payments with a long tail of large transfers
+    amount = np.clip(np.round(rng.lognormal(mean=np.log(120), sigma=1.1, size=n), 2), 1, 50_000)
+    return {
+        'transaction_id': np.arange(first_id, first_id + n),
+        'account_origin_id': accounts[origin],
+        'account_destination_id': accounts[dest],
+        'transaction_type_id': rng.choice(ref['types'], size=n),
+        'amount': amount,
+        'transaction_date': _random_datetimes(rng, n, start, end),
+        'branch_id': rng.choice(ref['branches'], size=n),
+        'description': np.full(n, 'Generated transaction', dtype=object),
+    }
+
+
+def make_loans(rng, ref, first_id, n, start, end):
+    start_dates = _random_datetimes(rng, n, start, end).astype('datetime64[D]')
+    return {
+        'loan_id': np.arange(first_id, first_id + n),
+        'account_id': rng.choice(ref['accounts'], size=n),
+        'loan_status_id': rng.choice(ref['statuses'], size=n),
+        'principal_amount': np.round(rng.uniform(1000, 10000, size=n), 2),
+        'interest_rate': np.round(rng.uniform(0.02, 0.15, size=n), 5),
+        'start_date': start_dates,
+        'estimated_end_date': start_dates + rng.integers(180, 721, size=n).astype('timedelta64[D]'),
+    }
+
+
+MAKERS = {'transactions': make_transactions, 'loans': make_loans}
+
+
+def _write_values(cur, table, columns, batch):
+    rows = list(zip(*(batch[c].tolist() for c in columns)))
+    execute_values(cur, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows, page_size=len(rows))
+    return len(cur.query or b"")
+
+
+def _write_copy(cur, table, columns, batch):
+    buf = io.StringIO()
+    for row in zip(*(batch[c].astype(str) for c in columns)):
+        buf.write("\t".join(row))
+        buf.write("\n")
+    size = buf.tell()
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+    return size
+
+
+WRITERS = {'values': _write_values, 'copy': _write_copy}
+
+
+def run_worker(worker, table, ref, first_id, rows, rate, batch_size, seed, method, start, end, writer=None):
+    """Insert `rows` rows with ids from first_id, one commit per batch, at most `rate` rows/sec.
+
+    Runs in this process for one worker; pool workers drop the parent's pooled
+    connections in the pool initializer (reset_engine_after_fork), so the
+    single-worker case keeps using the parent's pool.
+    writer: name of this worker's rollup_pending_ids entry, moved past each batch in its commit.
+    Returns (rows inserted, seconds, per-batch metrics observations).
+    """
+    rng = np.random.default_rng([seed, worker])
+    _, columns = TABLES[table]
+    make, write = MAKERS[table], WRITERS[method]
+
+    conn = get_psycopg_connection()
+    cur = conn.cursor()
+    done = 0
+    first_obs = len(instrumentation.completed())
+    began = time.perf_counter()
+    try:
+        while done < rows:
+            n = min(batch_size, rows - done)
+            with instrumentation.measure(f"insert.{table}"):
+                batch = make(rng, ref, first_id + done, n, start, end)
+                sent = time.perf_counter()
+                nbytes = write(cur, table, columns, batch)
+                if writer:
+                    rollups.reserve_ids(cur, writer, first_id + done + n, first_id + rows - 1)
+                conn.commit()
+                instrumentation.record(db=time.perf_counter() - sent, rows=n, nbytes=nbytes)
+            done += n
+            if rate > 0:
+                # stay on schedule: sleep until the time these rows were due
+                ahead = done / rate - (time.perf_counter() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+    finally:
+        cur.close()
+        conn.close()
+    return done, time.perf_counter() - began, instrumentation.completed(first_obs)
+
+
+def claim_ids(table, shares, writers):
+    """Reserve one block of primary keys for the whole run; returns each worker's first id.
+
+    Runs in one transaction under a SHARE ROW EXCLUSIVE lock on the table,
+    which waits for inserts already in flight and holds new ones back until
+    the block is claimed:
+      - the block starts after MAX(pk), the table's serial/identity sequence
+        and, for transactions, ids other load_generator runs still hold in
+        rollup_pending_ids;
+      - the sequence is moved to the end of the block, so writers that take
+        ids from it (transactions_auto_insert.py, auto_insert.py) skip it;
+      - each worker's range is reserved for the rollups in the same commit.
+    A table without a sequence is only safe against other load_generator
+    runs on transactions with the rollup tables in place.
+    writers: rollup_pending_ids names, or None entries when not reserving;
+    set to None in place if the rollup tables were never created.
+    """
+    pk, _ = TABLES[table]
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE;")
+            cur.execute(f"SELECT COALESCE(MAX({pk}), 0) FROM {table};")
+            last = cur.fetchone()[0]
+            cur.execute("SELECT pg_get_serial_sequence(%s, %s);", (table, pk))
+            seq = cur.fetchone()[0]
+            if seq:
+                cur.execute(f"SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {seq};")
+                last = max(last, cur.fetchone()[0])
+            cur.execute("SELECT to_regclass('rollup_pending_ids') IS NOT NULL;")
+            pending = cur.fetchone()[0]
+            if pending and table == 'transactions':
+                cur.execute("SELECT COALESCE(MAX(last_id), 0) FROM rollup_pending_ids;")
+                last = max(last, cur.fetchone()[0])
+            firsts = np.cumsum([last + 1] + shares[:-1]).tolist()
+            if seq:
+                cur.execute("SELECT setval(%s, %s);", (seq, last + sum(shares)))
+            if not pending:
+                writers[:] = [None] * len(writers)
+            for writer, first, share in zip(writers, firsts, shares):
+                if writer:
+                    rollups.reserve_ids(cur, writer, first, first + share - 1)
+        conn.commit()
+        return firsts
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _release_ranges(writers):
+    """Drop reservations left by workers that stopped early"""
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM rollup_pending_ids WHERE writer = ANY(%s);", (writers,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def generate(table='transactions', rows=100_000, rate=0, batch_size=5_000, workers=1, seed=42,
+             method='values', start=datetime(2023, 5, 1), end=datetime(2025, 12, 31)):
+    """Push `rows` synthetic rows into `table`; returns (rows inserted, seconds)"""
+    ref = load_reference_data(table)
+    workers = max(1, min(workers, rows))
+    shares = [rows // workers + (1 if i < rows % workers else 0) for i in range(workers)]
+    per_worker_rate = rate / workers if rate > 0 else 0
+    # workers commit out of id order, so a concurrent rollup refresh must not pass their unwritten ids
+    writers = [f"load_generator:{os.getpid()}:{i}" if table == 'transactions' else None for i in range(workers)]
+    firsts = claim_ids(table, shares, writers)
+    tasks = [(i, table, ref, firsts[i], shares[i], per_worker_rate, batch_size, seed, method, start, end, writers[i])
+             for i in range(workers)]
+
+    print(f"Generating {rows} {table} rows: {workers} worker(s), batch {batch_size}, "
+          f"rate {'unlimited' if rate <= 0 else f'{rate:g} rows/s'}, seed {seed}, method {method}")
+    began = time.perf_counter()
+    try:
+        if workers == 1:
+            results = [run_worker(*tasks[0])]
+        else:
+            with mp.Pool(workers, initializer=reset_engine_after_fork) as pool:
+                results = pool.starmap(run_worker, tasks)
+            for _, _, observations in results:
+                instrumentation.replay(observations)  # batches were measured in the worker processes
+    finally:
+        if writers[0]:
+            _release_ranges(writers)
+    elapsed = time.perf_counter() - began
+
+    inserted = sum(done for done, _, _ in results)
+    for i, (done, seconds, _) in enumerate(results):
+        print(f"  worker {i}: {done} rows in {seconds:.1f}s ({done / max(seconds, 1e-9):.0f} rows/s)")
+    print(f"Inserted {inserted} rows in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):.0f} rows/s)")
+    return inserted, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="High-rate synthetic transactions/loans generator for benchmarking")
+    parser.add_argument("--table", choices=list(TABLES), default="transactions")
+    parser.add_argument("--rows", type=int, default=100_000, help="total rows to insert")
+    parser.add_argument("--rate", type=float, default=0, help="target rows/sec over all workers, 0 = as fast as possible")
+    parser.add_argument("--batch-size", type=int, default=5_000, help="rows per INSERT/COPY and per commit")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed, same seed = same rows")
+    parser.add_argument("--method", choices=list(WRITERS), default="values", help="execute_values or COPY")
+    args = parser.parse_args()
+
+    generate(args.table, args.rows, args.rate, args.batch_size, args.workers, args.seed, args.method)
+    # generate() returns once every worker has committed its last batch
+    if USE_ROLLUPS and args.table == 'transactions':
+        rollups.refresh()
+    print_pool_summary()
+    write_query_metrics()
+
+if __name__ == "__main__":
+    main()
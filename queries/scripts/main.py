@@ -1,35 +1,60 @@
-from dotenv import load_dotenv
-import os
-import psycopg2
+import argparse
 import csv
-
-# laod variables from .env
-load_dotenv()
-
-# connection to db
-conn = psycopg2.connect(
-    dbname=os.getenv("DB_NAME"),
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASSWORD"),
-    host=os.getenv("DB_HOST")
-)
-cur = conn.cursor()
-
-def run_query(query, filename):
-    cur.execute(query)
-    rows = cur.fetchall()
-    colnames = [desc[0] for desc in cur.description]
+import gzip
+import os
+import time
+from config import get_psycopg_connection, print_pool_summary, write_query_metrics, USE_ROLLUPS
+import instrumentation
+import aggregates
+import querycache
+import rollups
+
+def csv_path(filename, compress=False):
+    return f"{filename}.csv.gz" if compress else f"{filename}.csv"
+
+def run_query(cur, query, filename, stream=False, compress=False):
+    with instrumentation.measure(f"main.{filename}"):
+        if stream:
+            stream_query(cur, query, filename, compress)
+            return
+        colnames, rows = querycache.fetch_rows(cur, query)
+        write_rows(colnames, rows, filename, compress=compress)
+
+def stream_query(cur, query, filename, compress=False):
+    """COPY the result straight into the CSV file; nothing is held in memory or printed per row"""
+    copy_sql = f"COPY ({query.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    path = csv_path(filename, compress)
+    started = time.perf_counter()
+    with (gzip.open(path, "wb") if compress else open(path, "wb")) as f:
+        cur.copy_expert(copy_sql, f)
+    # COPY interleaves query and transfer, so all of it counts as DB time
+    instrumentation.record(db=time.perf_counter() - started, rows=cur.rowcount, nbytes=os.path.getsize(path))
+    print(f"=== {filename} === {cur.rowcount} rows -> {path}")
+
+def export_frame(df, filename, stream=False, compress=False):
+    """Same output as run_query, for results derived in memory"""
+    with instrumentation.measure(f"main.{filename}"):
+        write_rows(list(df.columns), list(df.itertuples(index=False, name=None)), filename,
+                   quiet=stream, compress=compress)
+
+def write_rows(colnames, rows, filename, quiet=False, compress=False):
+    path = csv_path(filename, compress)
 
     # output in terminal
-    print(f"\n=== {filename} ===")
-    for row in rows:
-        print(row)
+    if quiet:
+        print(f"=== {filename} === {len(rows)} rows -> {path}")
+    else:
+        print(f"\n=== {filename} ===")
+        for row in rows:
+            print(row)
 
     # save to csv
-    with open(f"{filename}.csv", "w", newline="", encoding="utf-8") as f:
+    with (gzip.open(path, "wt", newline="", encoding="utf-8") if compress
+          else open(path, "w", newline="", encoding="utf-8")) as f:
         writer = csv.writer(f)
         writer.writerow(colnames)
         writer.writerows(rows)
+    instrumentation.record(rows=len(rows), nbytes=os.path.getsize(path))
 
 # num of customers
 query1 = "SELECT COUNT(*) AS customers_count FROM customers;"
@@ -67,6 +92,9 @@ ORDER BY transactions_count DESC
 LIMIT 10;
 """
 
+# same ranking from the account_activity counter (no OR-join over transactions), as of its last refresh
+query4_fast = rollups.TOP_CUSTOMERS_SQL.format(limit=10)
+
 query5 = """
 SELECT account_types.account_type_id,
        account_types.type_name,
@@ -149,17 +177,40 @@ GROUP BY ls.status_name
 ORDER BY loans_count DESC;
 """
 
-run_query(query1, "customer_count")
-run_query(query2, "avg_balance_per_acc_type")
-run_query(query3, "loans_stats")
-run_query(query4, "top10_customer_transactions")
-run_query(query5, "test1")
-run_query(query6, "test2")
-run_query(query7, "test3")
-run_query(query8, "test4")
-run_query(query9, "test5")
-run_query(query10, "test6")
-run_query(query11, "test7")
-
-cur.close()
-conn.close()
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description="Run the report queries and save each one to CSV")
+    parser.add_argument("--stream", action="store_true",
+                        help="COPY results straight to the files and print only row counts (flat memory)")
+    parser.add_argument("--gzip", action="store_true", help="write .csv.gz files")
+    args = parser.parse_args()
+    opts = {"stream": args.stream, "compress": args.gzip}
+
+    # one pooled connection is reused for every export
+    conn = get_psycopg_connection()
+    cur = conn.cursor()
+    try:
+        run_query(cur, query1, "customer_count", **opts)
+        run_query(cur, query2, "avg_balance_per_acc_type", **opts)
+        run_query(cur, query3, "loans_stats", **opts)
+        if USE_ROLLUPS:
+            # read-only: counts up to the current watermark, refreshed by `rollups.py refresh` and the writers
+            run_query(cur, query4_fast, "top10_customer_transactions", **opts)
+        else:
+            run_query(cur, query4, "top10_customer_transactions", **opts)
+        run_query(cur, query5, "test1", **opts)
+        # query6 and query7 are rolled up from the shared single-scan transaction cube
+        export_frame(instrumentation.measured("main.cube", aggregates.monthly_volume, 12), "test2", **opts)
+        export_frame(aggregates.type_stats(), "test3", **opts)
+        run_query(cur, query8, "test4", **opts)
+        run_query(cur, query9, "test5", **opts)
+        run_query(cur, query10, "test6", **opts)
+        run_query(cur, query11, "test7", **opts)
+    finally:
+        cur.close()
+        conn.close()
+    print_pool_summary()
+    querycache.print_cache_summary()
+    write_query_metrics()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+import pandas as pd
+from pyarrow import ArrowException
+from sqlalchemy import text
+import instrumentation
+from config import get_engine, fetch_frame, NUMERIC_AS_FLOAT, QUERY_CACHE, QUERY_CACHE_DIR, QUERY_CACHE_MAX_MB
+
+# bumped when what is stored for a query changes (2: Decimal columns of fetch_rows kept as text)
+CACHE_FORMAT = 2
+
+# queries whose result depends on today's date get the date in their key
+DATE_DEPENDENT = re.compile(r'current_date|current_timestamp|now\(\)|\bage\(', re.IGNORECASE)
+TABLE_NAMES = re.compile(r'\b(?:from|join)\s+((?:[a-z_][a-z0-9_]*\.)?[a-z_][a-z0-9_]*)', re.IGNORECASE)
+# FROM inside EXTRACT(field FROM ...), SUBSTRING(... FROM ...) and TRIM(... FROM ...) is not a table
+FUNCTION_FROM = re.compile(r'\b(extract|substring|trim)\s*\(([^()]*?)\bfrom\b', re.IGNORECASE)
+
+# per table: write counters plus the file node (changes on TRUNCATE, which the counters miss)
+FINGERPRINT_QUERY = """
+SELECT schemaname || '.' || relname, n_tup_ins, n_tup_upd, n_tup_del, pg_relation_filenode(relid) AS filenode
+FROM pg_stat_user_tables
+WHERE (schemaname || '.' || relname) = ANY(:qualified)
+   OR (relname = ANY(:names) AND schemaname = ANY(current_schemas(false)));
+"""
+
+# pg_stat_user_tables counters are flushed asynchronously and can trail a commit by seconds,
+# so tables filled up to a watermark (rollups.py registers them) also carry the watermark itself
+WATERMARKED = {}  # table -> watermark name in rollup_watermarks
+WATERMARK_QUERY = """
+SELECT name, last_transaction_id FROM rollup_watermarks WHERE name = ANY(:names);
+"""
+
+
+def normalize_sql(query):
+    return re.sub(r'\s+', ' ', query).strip().rstrip(';').strip()
+
+
+def tables_in(query):
+    """Names after FROM/JOIN, schema-qualified or not; CTE names are dropped later as they aren't user tables"""
+    query = FUNCTION_FROM.sub(lambda m: f"{m.group(1)}({m.group(2)}", query)
+    return sorted({name.lower() for name in TABLE_NAMES.findall(query)})
+
+
+class QueryCache:
+    """DataFrames cached on disk as Parquet, keyed by normalized SQL + parameters.
+
+    An entry is reused only while every table the query reads has the same
+    pg_stat_user_tables fingerprint (and rollup watermark, see WATERMARKED)
+    as when it was stored. The directory is kept under max_bytes by evicting
+    least recently used entries. Several processes can share it: the index
+    is merged with the one on disk and replaced atomically on every write.
+    """
+
+    def __init__(self, directory=QUERY_CACHE_DIR, max_bytes=QUERY_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, 'index.json')
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.bytes_saved = 0
+        self.removed = set()  # evicted here, so not taken back from another process's index
+        os.makedirs(directory, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        """Merge in entries other processes wrote since we loaded, evict, then replace the file"""
+        for key, entry in self._load_index().items():
+            if key in self.removed:
+                continue
+            if key not in self.index or entry['last_used'] > self.index[key]['last_used']:
+                self.index[key] = entry
+        self._evict()
+        fd, tmp = tempfile.mkstemp(prefix='index.', suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp, self.index_path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def key(self, query, params=None, cents=()):
+        parts = [normalize_sql(query), json.dumps(params or {}, sort_keys=True, default=str),
+                 f"float={NUMERIC_AS_FLOAT} cents={sorted(cents)} format={CACHE_FORMAT}"]
+        if DATE_DEPENDENT.search(query):
+            parts.append(date.today().isoformat())
+        return hashlib.sha256("\x00".join(parts).encode()).hexdigest()[:32]
+
+    def fingerprint(self, query):
+        """{table: [ins, upd, del, filenode]} for the tables the query reads, None if it reads none.
+
+        Watermarked tables add {'watermark:<name>': last_transaction_id}.
+        """
+        names = tables_in(query)
+        if not names:
+            return None
+        params = {'names': [n for n in names if '.' not in n], 'qualified': [n for n in names if '.' in n]}
+        watermarks = sorted({WATERMARKED[n.rsplit('.', 1)[-1]] for n in names
+                             if n.rsplit('.', 1)[-1] in WATERMARKED})
+        with get_engine().connect() as conn:
+            rows = conn.execute(text(FINGERPRINT_QUERY), params).fetchall()
+            if watermarks:
+                rows += [(f"watermark:{name}", value) for name, value in
+                         conn.execute(text(WATERMARK_QUERY), {'names': watermarks}).fetchall()]
+        return {r[0]: list(r[1:]) for r in rows} or None
+
+    def get_or_compute(self, query, params, compute, dtype_backend=None, cents=()):
+        """Cached DataFrame for the query, or compute() stored for next time.
+
+        dtype_backend is passed to read_parquet only when given ('numpy_nullable' or 'pyarrow').
+        df.attrs set by compute() are kept in the index and put back on a hit.
+        """
+        key = self.key(query, params, cents)
+        fingerprint = self.fingerprint(query)
+        with self.lock:
+            entry = self.index.get(key)
+        if entry and fingerprint is not None and entry['fingerprint'] == fingerprint:
+            options = {'dtype_backend': dtype_backend} if dtype_backend else {}
+            try:
+                df = pd.read_parquet(self._path(key), **options)
+            except (OSError, ValueError, ArrowException):  # missing or damaged file: a miss
+                df = None
+            if df is not None:
+                df.attrs.update(entry.get('attrs', {}))
+                with self.lock:
+                    entry['last_used'] = time.time()
+                    self.hits += 1
+                    self.bytes_saved += entry['frame_bytes']
+                    self._save_index()
+                return df
+
+        df = compute()
+        with self.lock:
+            self.misses += 1
+        if fingerprint is not None:
+            self._store(key, df, fingerprint)
+        return df
+
+    def _store(self, key, df, fingerprint):
+        path = self._path(key)
+        try:
+            df.to_parquet(path, index=False)
+        except Exception as e:  # unusual column types: serve uncached
+            print(f"Query cache: not storing result ({e})")
+            return
+        with self.lock:
+            self.index[key] = {
+                'fingerprint': fingerprint,
+                'file_bytes': os.path.getsize(path),
+                'frame_bytes': int(df.memory_usage(deep=True).sum()),
+                'last_used': time.time(),
+                'attrs': dict(df.attrs),
+            }
+            self.removed.discard(key)
+            self._save_index()
+
+    def _evict(self):
+        total = sum(e['file_bytes'] for e in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= self.index.pop(key)['file_bytes']
+            self.removed.add(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def summary(self):
+        return f"Query cache: {self.hits} hits, {self.misses} misses, {self.bytes_saved / 1024 / 1024:.1f} MB saved"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryCache()
+        return _cache
+
+
+def read_sql(query, params=None, cents=()):
+    """Typed DataFrame from config.fetch_frame, served from the cache when QUERY_CACHE is on"""
+    if not QUERY_CACHE:
+        return fetch_frame(query, params, cents=cents)
+    return get_cache().get_or_compute(query, params, lambda: fetch_frame(query, params, cents=cents),
+                                      cents=cents)
+
+
+def _execute_fetchall(cur, query):
+    started = time.perf_counter()
+    cur.execute(query)
+    executed = time.perf_counter()
+    rows = cur.fetchall()
+    instrumentation.record(db=executed - started, fetch=time.perf_counter() - executed)
+    return [desc[0] for desc in cur.description], rows
+
+
+def fetch_rows(cur, query):
+    """(column names, rows) like cur.fetchall(); NULLs come back as None from the cache too.
+
+    Decimal columns are cached as text: Parquet decimals have one scale per
+    column and would print Decimal('1.5') back as 1.50.
+    """
+    if not QUERY_CACHE:
+        return _execute_fetchall(cur, query)
+
+    def compute():
+        colnames, rows = _execute_fetchall(cur, query)
+        df = pd.DataFrame(rows, columns=colnames, dtype=object)
+        decimals = [name for name in df.columns if df[name].map(lambda v: isinstance(v, Decimal)).any()]
+        for name in decimals:
+            df[name] = df[name].map(lambda v: None if v is None else str(v))
+        df.attrs['decimal_columns'] = decimals
+        return df
+
+    df = get_cache().get_or_compute(query, None, compute, dtype_backend='numpy_nullable')
+    decimals = df.attrs.get('decimal_columns', [])
+    df = df.astype(object).where(df.notna(), None)
+    for name in decimals:
+        df[name] = df[name].map(lambda v: None if v is None else Decimal(v))
+    return list(df.columns), list(df.itertuples(index=False, name=None))
+
+
+def print_cache_summary():
+    if QUERY_CACHE and _cache is not None:
+        print(_cache.summary())
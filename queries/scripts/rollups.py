@@ -0,0 +1,321 @@
+import argparse
+import os
+import time
+import pandas as pd
+from sqlalchemy import text
+from config import get_engine, get_psycopg_connection, print_pool_summary
+import querycache
+
+DDL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'csv_to_sql', 'rollups.sql')
+
+# rollup table -> (key columns, extra filter); all of them share the tx_monthly watermark
+ROLLUPS = {
+    'tx_monthly': (['month'], ""),
+    'tx_monthly_branch': (['month', 'branch_id'], "AND t.branch_id IS NOT NULL"),
+    'tx_monthly_type': (['month', 'transaction_type_id'], "AND t.transaction_type_id IS NOT NULL"),
+}
+
+UPSERT_SQL = """
+INSERT INTO {table} ({keys}, tx_count, amount_count, amount_sum)
+SELECT {select_keys},
+       COUNT(t.transaction_id),
+       COUNT(t.amount),
+       COALESCE(SUM(t.amount), 0)
+FROM transactions t
+WHERE t.transaction_id > %(low)s AND t.transaction_id <= %(high)s
+  AND t.transaction_date IS NOT NULL {extra}
+GROUP BY {group_keys}
+ON CONFLICT ({keys}) DO UPDATE SET
+    tx_count = {table}.tx_count + EXCLUDED.tx_count,
+    amount_count = {table}.amount_count + EXCLUDED.amount_count,
+    amount_sum = {table}.amount_sum + EXCLUDED.amount_sum;
+"""
+
+# origin and destination sides combined with UNION ALL, so both use their own index
+ACCOUNT_ACTIVITY_SQL = """
+INSERT INTO account_activity (account_id, origin_count, destination_count)
+SELECT account_id, SUM(origin), SUM(destination)
+FROM (
+    SELECT t.account_origin_id AS account_id, 1 AS origin, 0 AS destination
+    FROM transactions t
+    WHERE t.transaction_id > %(low)s AND t.transaction_id <= %(high)s
+      AND t.account_origin_id IS NOT NULL
+    UNION ALL
+    SELECT t.account_destination_id, 0, 1
+    FROM transactions t
+    WHERE t.transaction_id > %(low)s AND t.transaction_id <= %(high)s
+      AND t.account_destination_id IS NOT NULL
+      AND t.account_destination_id IS DISTINCT FROM t.account_origin_id
+) x
+GROUP BY account_id
+ON CONFLICT (account_id) DO UPDATE SET
+    origin_count = account_activity.origin_count + EXCLUDED.origin_count,
+    destination_count = account_activity.destination_count + EXCLUDED.destination_count;
+"""
+
+# same ranking as main.py query4, read from account_activity
+TOP_CUSTOMERS_SQL = """
+SELECT c.customer_id,
+    c.first_name,
+    c.last_name,
+    SUM(aa.tx_count) AS transactions_count
+FROM customers c
+JOIN accounts a ON a.customer_id = c.customer_id
+JOIN account_activity aa ON aa.account_id = a.account_id
+GROUP BY c.customer_id, c.first_name, c.last_name
+ORDER BY transactions_count DESC
+LIMIT {limit};
+"""
+
+
+def _upsert_sql(table):
+    keys, extra = ROLLUPS[table]
+    select_keys = ", ".join(
+        "DATE_TRUNC('month', t.transaction_date)::DATE" if k == 'month' else f"t.{k}" for k in keys)
+    group_keys = ", ".join(str(i + 1) for i in range(len(keys)))
+    return UPSERT_SQL.format(table=table, keys=", ".join(keys), select_keys=select_keys,
+                             group_keys=group_keys, extra=extra)
+
+
+# watermark name -> (tables it fills, statements run for each new id range)
+WATERMARKS = {
+    'tx_monthly': (list(ROLLUPS), [_upsert_sql(table) for table in ROLLUPS]),
+    'account_activity': (['account_activity'], [ACCOUNT_ACTIVITY_SQL]),
+}
+
+# cached reads of these tables are checked against the watermark, which is exact right after a refresh
+querycache.WATERMARKED.update({table: name for name, (tables, _) in WATERMARKS.items() for table in tables})
+
+
+def init():
+    """Create rollup tables and the watermark row"""
+    with open(DDL_PATH, encoding='utf-8') as f:
+        ddl = f.read()
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(ddl)
+        conn.commit()
+    finally:
+        conn.close()
+    print("Rollup tables ready")
+
+
+def reserve_ids(cur, writer, next_id, last_id):
+    """Record that writer still has to commit ids next_id..last_id (removes the entry once next_id > last_id).
+
+    Call it in the same DB transaction as the rows it covers, and commit the
+    first reservation before any of them is written.
+    """
+    if next_id > last_id:
+        cur.execute("DELETE FROM rollup_pending_ids WHERE writer = %s;", (writer,))
+    else:
+        cur.execute("""
+        INSERT INTO rollup_pending_ids (writer, next_id, last_id) VALUES (%s, %s, %s)
+        ON CONFLICT (writer) DO UPDATE SET next_id = EXCLUDED.next_id, last_id = EXCLUDED.last_id;
+        """, (writer, next_id, last_id))
+
+
+def hold_watermarks(cur):
+    """For writers that insert without reserving their ids in rollup_pending_ids.
+
+    Share-locks every watermark row until the caller's transaction ends, so a
+    refresh (which locks its row FOR UPDATE) waits for the rows inserted after
+    this call instead of moving past their ids. Call it before the first insert.
+    Does nothing if the rollup tables were never created.
+    """
+    cur.execute("SELECT to_regclass('rollup_watermarks') IS NOT NULL;")
+    if cur.fetchone()[0]:
+        cur.execute("SELECT name FROM rollup_watermarks FOR SHARE;")
+
+
+def refresh_one(name, rebuild=False):
+    """Fold transactions above one watermark into its tables.
+
+    Runs in one DB transaction: the watermark row is locked, only rows in
+    (watermark, high] are aggregated and added to the existing totals, then
+    the watermark moves up to high. high is the largest committed id below
+    every id still reserved in rollup_pending_ids, so a batch that commits
+    after a higher one is folded in by a later refresh instead of skipped.
+    rebuild=True empties the tables and starts from zero (use it after
+    updates/deletes of old transactions). Returns the number of transactions
+    folded in.
+    """
+    tables, statements = WATERMARKS[name]
+    start = time.perf_counter()
+    conn = get_psycopg_connection()
+    try:
+        with conn.cursor() as cur:
+            if rebuild:
+                cur.execute(f"TRUNCATE {', '.join(tables)};")
+                cur.execute("UPDATE rollup_watermarks SET last_transaction_id = 0 WHERE name = %s;", (name,))
+            cur.execute("SELECT last_transaction_id FROM rollup_watermarks WHERE name = %s FOR UPDATE;", (name,))
+            row = cur.fetchone()
+            if row is None:
+                raise RuntimeError(f"Watermark {name} missing, run `python rollups.py init` first")
+            low = row[0]
+            # one statement, one snapshot: a batch and its reservation update commit together
+            cur.execute("""
+            SELECT MAX(transaction_id), COUNT(*)
+            FROM transactions
+            WHERE transaction_id > %s
+              AND transaction_id <= COALESCE((SELECT MIN(next_id) - 1 FROM rollup_pending_ids), 2147483647);
+            """, (low,))
+            high, new_rows = cur.fetchone()
+            if high is not None:
+                for statement in statements:
+                    cur.execute(statement, {'low': low, 'high': high})
+                cur.execute("UPDATE rollup_watermarks SET last_transaction_id = %s, refreshed_at = NOW() "
+                            "WHERE name = %s;", (high, name))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+    if new_rows:
+        print(f"{name}: {new_rows} new transactions folded in (ids {low + 1}..{high}) in {elapsed:.3f}s")
+    else:
+        print(f"{name}: up to date (watermark {low}), checked in {elapsed:.3f}s")
+    return new_rows
+
+
+def refresh(rebuild=False):
+    """Refresh every rollup; returns {watermark name: transactions folded in}"""
+    return {name: refresh_one(name, rebuild) for name in WATERMARKS}
+
+
+def status():
+    query = """
+    SELECT w.name, w.last_transaction_id, w.refreshed_at,
+           (SELECT MAX(transaction_id) FROM transactions) AS max_transaction_id,
+           (SELECT MIN(next_id) FROM rollup_pending_ids) AS lowest_pending_id
+    FROM rollup_watermarks w
+    ORDER BY w.name;
+    """
+    with get_engine().connect() as conn:
+        df = pd.read_sql(text(query), conn)
+    print(df.to_string(index=False))
+    return df
+
+
+def _read(query, **params):
+    return querycache.read_sql(query, params or None)
+
+
+# readers used by the charts/exports instead of scanning transactions
+
+def monthly_counts(months=12):
+    df = _read("""
+    SELECT month, tx_count
+    FROM tx_monthly
+    WHERE month >= DATE_TRUNC('month', CURRENT_DATE - make_interval(months => %(months)s))::DATE
+    ORDER BY month;
+    """, months=months)
+    return df
+
+
+def all_time_monthly_counts():
+    return _read("""
+    SELECT month, tx_count AS transaction_count
+    FROM tx_monthly
+    ORDER BY month;
+    """)
+
+
+def monthly_branch_amounts():
+    df = _read("""
+    SELECT r.month,
+           b.branch_name,
+           SUM(r.amount_sum)::NUMERIC(18,2) AS total_amount,
+           SUM(r.tx_count) AS tx_count
+    FROM tx_monthly_branch r
+    JOIN branches b ON r.branch_id = b.branch_id
+    GROUP BY r.month, b.branch_name
+    ORDER BY r.month, b.branch_name;
+    """)
+    df['total_amount'] = df['total_amount'].astype(float)
+    return df
+
+
+def top_customers(limit=10):
+    return _read(TOP_CUSTOMERS_SQL.format(limit=int(limit)))
+
+
+def verify_account_activity():
+    """Compare per-customer counts from account_activity with the original OR-join.
+
+    Checks every customer, not just the top 10 (ties make LIMIT order arbitrary).
+    The join only counts transactions up to the watermark, so rows a running
+    load generator has not committed in order yet do not show up as mismatches.
+    Returns the number of customers whose counts differ.
+    """
+    refresh_one('account_activity')
+    original = _read("""
+    SELECT a.customer_id, COUNT(t.transaction_id) AS original_count
+    FROM accounts a
+    JOIN transactions t ON (t.account_origin_id = a.account_id OR t.account_destination_id = a.account_id)
+    WHERE t.transaction_id <= (SELECT last_transaction_id FROM rollup_watermarks WHERE name = 'account_activity')
+    GROUP BY a.customer_id;
+    """)
+    fast = _read("""
+    SELECT a.customer_id, SUM(aa.tx_count) AS fast_count
+    FROM accounts a
+    JOIN account_activity aa ON aa.account_id = a.account_id
+    WHERE aa.tx_count > 0
+    GROUP BY a.customer_id;
+    """)
+    merged = original.merge(fast, on='customer_id', how='outer').fillna(0)
+    diff = merged[merged['original_count'] != merged['fast_count']]
+    print(f"account_activity check: {len(merged)} customers compared, {len(diff)} mismatches")
+    if len(diff):
+        print(diff.head(20).to_string(index=False))
+    return len(diff)
+
+
+def verify_monthly():
+    """Compare tx_monthly with the transactions up to its watermark.
+
+    Rows a writer committed below the watermark without reserving its ids or
+    holding the watermarks (see rollups.sql) are missing from the rollup and
+    show up here. Returns the number of transactions missing (negative: extra).
+    """
+    query = """
+    SELECT w.last_transaction_id,
+           (SELECT COUNT(*) FROM transactions t
+            WHERE t.transaction_id <= w.last_transaction_id AND t.transaction_date IS NOT NULL) AS expected,
+           (SELECT COALESCE(SUM(tx_count), 0) FROM tx_monthly) AS rolled_up
+    FROM rollup_watermarks w
+    WHERE w.name = 'tx_monthly';
+    """
+    with get_engine().connect() as conn:
+        watermark, expected, rolled_up = conn.execute(text(query)).one()
+    gap = expected - rolled_up
+    print(f"tx_monthly check: {expected} transactions up to watermark {watermark}, {rolled_up} rolled up"
+          + (f", {gap} missing: run `python rollups.py rebuild`" if gap else ""))
+    return gap
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain transaction rollups and the account activity counter")
+    parser.add_argument("command", choices=["init", "refresh", "rebuild", "status", "verify", "verify-activity"])
+    args = parser.parse_args()
+
+    if args.command == "init":
+        init()
+    elif args.command == "refresh":
+        refresh()
+    elif args.command == "rebuild":
+        refresh(rebuild=True)
+    elif args.command == "verify":
+        verify_monthly()
+        verify_account_activity()
+    elif args.command == "verify-activity":
+        verify_account_activity()
+    else:
+        status()
+    print_pool_summary()
+
+if __name__ == "__main__":
+    main()
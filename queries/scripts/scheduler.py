@@ -0,0 +1,87 @@
+import multiprocessing as mp
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from config import DB_POOL_SIZE, DB_MAX_OVERFLOW
+from instrumentation import measured
+
+
+def _init_render_worker():
+    # pyplot state is global per process, so each worker renders headless on its own
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _fetch(name, fetch):
+    return _timed(measured, f"chart.{name}", fetch)
+
+
+def _render(render, df):
+    return _timed(render, df)[1]
+
+
+def run_charts(charts, jobs=4):
+    """Fetch data for every chart at once, render each one in a process pool.
+
+    charts is a list of (name, fetch, render) tuples. fetch runs in a thread
+    and borrows a connection from the shared pool, so at most pool_size +
+    max_overflow fetches run at once; render must be a module-level function
+    so it can be sent to a worker process. A chart is handed to the
+    renderers as soon as its data arrives, so fetching and rendering overlap.
+    Returns a dict with per-chart and per-phase wall-clock times in seconds.
+    """
+    timings = {name: {} for name, _, _ in charts}
+    started = time.perf_counter()
+
+    if jobs <= 1:
+        for name, fetch, render in charts:
+            df, timings[name]["fetch"] = _fetch(name, fetch)
+            timings[name]["render"] = _timed(render, df)[1]
+            timings[name]["total"] = time.perf_counter() - started
+        fetch_done = render_start = started
+    else:
+        fetch_done = render_start = None
+        # more threads than pooled connections would just wait on the pool
+        fetch_workers = min(jobs, DB_POOL_SIZE + DB_MAX_OVERFLOW)
+        # spawn: renderers start after the fetch threads, and forking a process with
+        # running threads can copy a lock (logging, the connection pool) in a held state
+        with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers, \
+                ProcessPoolExecutor(max_workers=jobs, initializer=_init_render_worker,
+                                    mp_context=mp.get_context("spawn")) as renderers:
+            fetches = {fetchers.submit(_fetch, name, fetch): (name, render) for name, fetch, render in charts}
+            renders = {}
+            for future in as_completed(fetches):
+                name, render = fetches[future]
+                df, timings[name]["fetch"] = future.result()
+                if render_start is None:
+                    render_start = time.perf_counter()
+                renders[renderers.submit(_render, render, df)] = name
+            fetch_done = time.perf_counter()
+
+            for future in as_completed(renders):
+                name = renders[future]
+                timings[name]["render"] = future.result()
+                timings[name]["total"] = time.perf_counter() - started
+
+    finished = time.perf_counter()
+    phases = {
+        "fetch": fetch_done - started if jobs > 1 else sum(t["fetch"] for t in timings.values()),
+        "render": finished - render_start if jobs > 1 else sum(t["render"] for t in timings.values()),
+        "total": finished - started,
+    }
+    print_timings(timings, phases, jobs)
+    return {"charts": timings, "phases": phases}
+
+
+def print_timings(timings, phases, jobs):
+    print(f"\n--- chart timings (jobs={jobs}) ---")
+    print(f"{'chart':<24}{'fetch, s':>10}{'render, s':>11}{'done at, s':>12}")
+    for name, t in timings.items():
+        print(f"{name:<24}{t['fetch']:>10.2f}{t['render']:>11.2f}{t['total']:>12.2f}")
+    print(f"phase fetch: {phases['fetch']:.2f}s, phase render: {phases['render']:.2f}s, "
+          f"wall total: {phases['total']:.2f}s\n")
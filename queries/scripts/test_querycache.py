@@ -0,0 +1,54 @@
+from decimal import Decimal
+import main
+import querycache
+
+QUERY = "SELECT type_name, AVG(balance) AS avg_balance, COUNT(*) FROM accounts GROUP BY type_name;"
+ROWS = [("Savings", Decimal("1.5"), 3), ("Checking", Decimal("1234.5678"), 2),
+        ("Credit", None, 1), ("Loan", Decimal("-0.10"), 4), ("Empty", Decimal("1E+2"), 0)]
+
+
+class FakeCursor:
+    """Just enough of a psycopg2 cursor for querycache.fetch_rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = 0
+        self.description = [("type_name",), ("avg_balance",), ("count",)]
+
+    def execute(self, query):
+        self.executed += 1
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+def test_cold_and_warm_runs_write_the_same_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(querycache, "QUERY_CACHE", True)
+    monkeypatch.setattr(querycache, "_cache", querycache.QueryCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(querycache.QueryCache, "fingerprint", lambda self, query: {"public.accounts": [1, 0, 0, 1]})
+    monkeypatch.chdir(tmp_path)
+    cur = FakeCursor(ROWS)
+
+    main.run_query(cur, QUERY, "cold")
+    main.run_query(cur, QUERY, "warm")
+
+    assert cur.executed == 1
+    assert querycache._cache.hits == 1
+    assert (tmp_path / "cold.csv").read_bytes() == (tmp_path / "warm.csv").read_bytes()
+    # same text as the uncached path, which writes the driver's Decimals as they are
+    monkeypatch.setattr(querycache, "QUERY_CACHE", False)
+    main.run_query(cur, QUERY, "uncached")
+    assert (tmp_path / "cold.csv").read_bytes() == (tmp_path / "uncached.csv").read_bytes()
+
+
+def test_warm_rows_keep_decimal_values_and_scale(tmp_path, monkeypatch):
+    monkeypatch.setattr(querycache, "QUERY_CACHE", True)
+    monkeypatch.setattr(querycache, "_cache", querycache.QueryCache(str(tmp_path)))
+    monkeypatch.setattr(querycache.QueryCache, "fingerprint", lambda self, query: {"public.accounts": [1, 0, 0, 1]})
+    rows = [("a", Decimal("2.5"), 1), ("b", Decimal("3.125"), 2)]
+
+    querycache.fetch_rows(FakeCursor(rows), QUERY)
+    _, warm = querycache.fetch_rows(FakeCursor([]), QUERY)
+
+    assert [str(row[1]) for row in warm] == ["2.5", "3.125"]
+    assert all(isinstance(row[1], Decimal) for row in warm)
@@ -0,0 +1,116 @@
+import html
+import json
+import os
+import plotly.express as px
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+# The page carries the data once, as columns; frames are built from it in the
+# browser instead of repeating a full trace per month. plotly.js is a shared
+# file next to the charts, not inlined into every page.
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{plotly_js}"></script>
+</head>
+<body>
+<div id="chart" style="height:600px"></div>
+<div id="load-time" style="font:12px sans-serif;color:#888"></div>
+<script>
+const started = performance.now();
+const payload = {payload};
+const container = document.getElementById('chart');
+if (!payload.months.length) {{
+  container.style.cssText = 'height:auto;padding:2em;font:16px sans-serif;color:#888';
+  container.textContent = 'No data: there are no transactions to show.';
+}} else {{
+  const frames = payload.months.map((month, i) => ({{name: month, data: [{{y: payload.amounts[i]}}]}}));
+  const animation = {{mode: 'immediate', frame: {{duration: 500, redraw: false}}, transition: {{duration: 300}}}};
+  const layout = {{
+    title: payload.title,
+    height: 600,
+    xaxis: {{title: 'Branch'}},
+    yaxis: {{title: 'Total Amount ($)', range: [payload.ymin * 1.05, payload.ymax * 1.05]}},
+    sliders: [{{
+      active: 0,
+      currentvalue: {{prefix: 'month='}},
+      steps: payload.months.map(month => ({{label: month, method: 'animate', args: [[month], animation]}})),
+    }}],
+    updatemenus: [{{
+      type: 'buttons', showactive: false, x: 0.1, y: 0, xanchor: 'right', yanchor: 'top', direction: 'left',
+      buttons: [
+        {{label: '\\u25B6', method: 'animate', args: [null, Object.assign({{fromcurrent: true}}, animation)]}},
+        {{label: '\\u25FC', method: 'animate', args: [[null], {{mode: 'immediate', frame: {{duration: 0}}, transition: {{duration: 0}}}}]}},
+      ],
+    }}],
+  }};
+  const trace = {{type: 'bar', x: payload.branches, y: payload.amounts[0], marker: {{color: payload.colors}}}};
+  Plotly.newPlot(container, [trace], layout)
+    .then(chart => Plotly.addFrames(chart, frames))
+    .then(() => {{
+      const ms = Math.round(performance.now() - started);
+      document.getElementById('load-time').textContent = `rendered in ${{ms}} ms`;
+      console.log(`time slider rendered in ${{ms}} ms`);
+    }});
+}}
+</script>
+</body>
+</html>
+"""
+
+OTHER = '(other branches)'  # parenthesised so it does not read as a branch name
+
+
+def shared_plotlyjs(directory):
+    """Write plotly.js into `directory` once per version; returns its file name"""
+    name = f"plotly-{get_plotlyjs_version()}.min.js"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+    return name
+
+
+def payload(df, title, max_branches=0):
+    """Columnar chart data: months, branches, colours and one amounts row per month.
+
+    With max_branches > 0 only the branches with the largest overall totals
+    get their own bar; the rest are summed into one OTHER bar (suffixed with
+    '*' while a real branch has that name). The y range covers negative
+    amounts too.
+    """
+    df = df.copy()
+    df['month'] = df['month'].astype(str)
+    totals = df.groupby('branch_name')['total_amount'].sum().sort_values(ascending=False)
+    other = OTHER
+    while other in totals.index:
+        other += '*'
+    if max_branches and len(totals) > max_branches:
+        keep = set(totals.index[:max_branches])
+        df.loc[~df['branch_name'].isin(keep), 'branch_name'] = other
+    grid = df.pivot_table(index='month', columns='branch_name', values='total_amount', aggfunc='sum', fill_value=0)
+    branches = [b for b in sorted(grid.columns) if b != other] + ([other] if other in grid.columns else [])
+    grid = grid[branches].sort_index().round(2)
+    palette = px.colors.qualitative.Plotly
+    ymin = min(float(grid.values.min()), 0.0) if grid.size else 0.0
+    ymax = max(float(grid.values.max()), 0.0) if grid.size else 1.0
+    return {
+        'title': title,
+        'months': list(grid.index),
+        'branches': branches,
+        'colors': ['#999999' if b == other else palette[i % len(palette)] for i, b in enumerate(branches)],
+        'amounts': grid.values.tolist(),
+        'ymin': ymin,
+        'ymax': ymax if ymax > ymin else 1.0,
+    }
+
+
+def write_compact_html(df, filepath, title, max_branches=0):
+    """Write the time slider page; returns (page bytes, shared plotly.js bytes)"""
+    directory = os.path.dirname(filepath) or '.'
+    plotly_js = shared_plotlyjs(directory)
+    data = json.dumps(payload(df, title, max_branches), separators=(',', ':')).replace('</', '<\\/')
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(PAGE.format(title=html.escape(title), plotly_js=plotly_js, payload=data))
+    return os.path.getsize(filepath), os.path.getsize(os.path.join(directory, plotly_js))
@@ -1,17 +1,13 @@
-import pandas as pd
-from config import get_engine
+from config import print_pool_summary, USE_ROLLUPS
+import aggregates
+import rollups
 
-engine = get_engine()
-
-query = """
-SELECT 
-    DATE_TRUNC('month', transaction_date)::DATE AS month,
-    COUNT(transaction_id) AS transaction_count
-FROM transactions
-GROUP BY month
-ORDER BY month;
-"""
-
-df = pd.read_sql(query, engine)
+if USE_ROLLUPS:
+    # read the pre-aggregated tx_monthly rollup, no scan of transactions
+    df = rollups.all_time_monthly_counts()
+else:
+    # monthly counts are rolled up from the shared single-scan transaction cube
+    df = aggregates.all_time_monthly_counts()
 df.to_csv("transaction_trends.csv", index=False)
-print("CSV exported: transaction_trends.csv")
\ No newline at end of file
+print("CSV exported: transaction_trends.csv")
+print_pool_summary()
\ No newline at end of file
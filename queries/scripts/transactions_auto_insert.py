@@ -1,5 +1,7 @@
-from config import get_psycopg_connection
-import random, datetime
+from config import get_psycopg_connection, print_pool_summary, write_query_metrics, USE_ROLLUPS
+import instrumentation
+import rollups
+import random, datetime, time
 
 def random_date(start, end):
     delta = end - start
@@ -16,6 +18,9 @@ cur = conn.cursor()
 cur.execute("SELECT account_id FROM accounts;")
 account_ids = [row[0] for row in cur.fetchall()]
 
+# these ids are not reserved in rollup_pending_ids, so keep refreshes from passing them until the commit below
+rollups.hold_watermarks(cur)
+
 for _ in range(10):
     transaction_date = random_date(start_date, end_date)
     acc_from = random.choice(account_ids)
@@ -23,27 +28,35 @@ for _ in range(10):
     while acc_to == acc_from:
         acc_to = random.choice(account_ids)
 
-    cur.execute("""
-        INSERT INTO transactions (
-            account_origin_id,
-            account_destination_id,
-            transaction_type_id,
-            amount,
+    with instrumentation.measure("insert.transactions"):
+        started = time.perf_counter()
+        cur.execute("""
+            INSERT INTO transactions (
+                account_origin_id,
+                account_destination_id,
+                transaction_type_id,
+                amount,
+                transaction_date,
+                branch_id,
+                description
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (
+            acc_from,
+            acc_to,
+            random.randint(1, 4),
+            round(random.uniform(10, 500), 2),
             transaction_date,
-            branch_id,
-            description
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-    """, (
-        acc_from,
-        acc_to,
-        random.randint(1, 4),
-        round(random.uniform(10, 500), 2),
-        transaction_date,
-        random.randint(1, 10),
-        'Auto-insert transaction'
-    ))
+            random.randint(1, 10),
+            'Auto-insert transaction'
+        ))
+        instrumentation.record(db=time.perf_counter() - started, rows=1, nbytes=len(cur.query))
 
 conn.commit()
 conn.close()
 print("Inserted 10 new transactions.")
+
+if USE_ROLLUPS:
+    rollups.refresh()
+print_pool_summary()
+write_query_metrics()